@@ -0,0 +1,24 @@
+import sys
+import time
+
+
+def post_fork(server, worker):
+    # The worker imports the app after this, so its import time can be logged once it's loaded
+    worker.forked_at = time.perf_counter()
+
+
+def post_worker_init(worker):
+    """Logs how long the app took to import, then warms the worker up before
+    it accepts requests. A worker which can't warm up exits, and gunicorn
+    starts another in its place."""
+    from transform import logger, settings
+    logger.info("Loaded Transform Cora", import_seconds=round(time.perf_counter() - worker.forked_at, 3))
+
+    if settings.WARM_UP:
+        from transform.warmup import warm_up
+        try:
+            warm_up()
+        except Exception:
+            # Exiting rather than raising: gunicorn stops altogether if a worker
+            # raises before it has booted
+            sys.exit(1)
@@ -1,8 +1,11 @@
-from transform import app
+from transform import app, settings
+from transform.warmup import start_warm_up
 import os
 
 
 if __name__ == '__main__':
     # Startup
     port = int(os.getenv("PORT"))
+    if settings.WARM_UP:
+        start_warm_up()
     app.run(debug=True, host='0.0.0.0', port=port)
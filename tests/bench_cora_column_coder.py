@@ -0,0 +1,55 @@
+"""
+Benchmark for re-coding many CORA submissions at once.
+
+Compares coding each submission's tkn file with ``CORATransformer._transform``
+and ``_tkn_lines`` against ``CORAColumnCoder``, which codes a question at a
+time across the whole batch.
+
+Run from the repository root::
+
+    python -m tests.bench_cora_column_coder
+
+"""
+import json
+import random
+import timeit
+
+from transform.transformers.cora_column_coder import CORAColumnCoder
+from tests.test_cora_column_coder import per_response_tkn
+
+REPLIES = ["tests/replies/ukis-01.json", "tests/replies/ukis-02.json"]
+
+
+def make_responses(n, rng):
+    """Copies of the replies with answers shuffled between them, all of which code"""
+    replies = []
+    for path in REPLIES:
+        with open(path) as fp:
+            replies.append(json.load(fp))
+
+    responses = []
+    for i in range(n):
+        response = dict(replies[i % len(replies)])
+        response["data"] = {
+            q: rng.choice([r["data"][q] for r in replies if q in r["data"]])
+            for q in set().union(*(r["data"] for r in replies))
+            if rng.random() < 0.8
+        }
+        responses.append(response)
+    return responses
+
+
+def run(n=5000, number=3):
+    responses = make_responses(n, random.Random(0))
+    coder = CORAColumnCoder()
+
+    assert [per_response_tkn(r) for r in responses] == coder.tkn(responses)
+
+    before = timeit.timeit(lambda: [per_response_tkn(r) for r in responses], number=number) / number
+    after = timeit.timeit(lambda: coder.tkn(responses), number=number) / number
+    print("{0} responses: per response {1:.0f}ms, by column {2:.0f}ms ({3:.1f}x)".format(
+        n, before * 1e3, after * 1e3, before / after))
+
+
+if __name__ == "__main__":
+    run()
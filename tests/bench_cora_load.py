@@ -0,0 +1,51 @@
+"""
+Load test for a running transform service's /cora endpoint.
+
+Posts the reply fixtures from many client threads at once and reports
+throughput and latency. Run it against the service started with each
+configuration to compare, for example::
+
+    CORA_PIPELINE=true ./startup.sh
+    python -m tests.bench_cora_load --url http://localhost:5000/cora --clients 32
+
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import requests
+
+REPLIES = ["tests/replies/ukis-01.json", "tests/replies/ukis-02.json"]
+
+
+def post(url, payload):
+    start = time.perf_counter()
+    r = requests.post(url, data=payload)
+    r.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run(url, clients, requests_per_client):
+    payloads = []
+    for path in REPLIES:
+        with open(path) as fp:
+            payloads.append(fp.read())
+    work = [payloads[i % len(payloads)] for i in range(clients * requests_per_client)]
+
+    with ThreadPoolExecutor(clients) as executor:
+        start = time.perf_counter()
+        latencies = sorted(executor.map(lambda payload: post(url, payload), work))
+        elapsed = time.perf_counter() - start
+
+    print("{0} requests from {1} clients in {2:.1f}s: {3:.1f} req/s, p50 {4:.0f}ms, p99 {5:.0f}ms".format(
+        len(work), clients, elapsed, len(work) / elapsed,
+        latencies[len(latencies) // 2] * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000/cora")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    args = parser.parse_args()
+    run(args.url, args.clients, args.requests)
@@ -0,0 +1,65 @@
+"""
+Latency benchmark for pipelined /cora transforms.
+
+Times making the zip for each reply fixture with its stages run one after
+another, and with CORA_PIPELINE's stage graph, where image numbers are
+allocated while the pdf is rasterised and the idbr, tkn and response json
+are made while both wait. sdx-sequence is stood in for by a call taking
+--sequence-ms.
+
+Run from the repository root::
+
+    python -m tests.bench_cora_pipeline --sequence-ms 20
+
+"""
+import argparse
+import json
+import logging
+import time
+from unittest.mock import patch
+
+from structlog import wrap_logger
+
+from transform import settings
+from transform.transformers.cora_transformer import CORATransformer
+
+REPLIES = ["tests/replies/ukis-01.json", "tests/replies/ukis-02.json"]
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+
+def latency(survey, response, number):
+    CORATransformer(logger, survey, response, 1000).create_zip()
+    start = time.perf_counter()
+    for _ in range(number):
+        CORATransformer(logger, survey, response, 1000).create_zip()
+    return (time.perf_counter() - start) / number
+
+
+def run(sequence_ms, number):
+    def allocate(self, n):
+        time.sleep(sequence_ms / 1000)
+        return range(1, n + 1)
+
+    with open("transform/surveys/144.0001.json") as fp:
+        survey = json.load(fp)
+
+    with patch("transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list", allocate):
+        for path in REPLIES:
+            with open(path) as fp:
+                response = json.load(fp)
+
+            with patch.object(settings, "CORA_PIPELINE", False):
+                sequential = latency(survey, response, number)
+            with patch.object(settings, "CORA_PIPELINE", True):
+                pipelined = latency(survey, response, number)
+            print("{0}: sequential {1:.0f}ms, pipelined {2:.0f}ms ({3:.1f}x)".format(
+                path, sequential * 1000, pipelined * 1000, sequential / pipelined))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sequence-ms", type=float, default=20, help="time taken by each sdx-sequence call")
+    parser.add_argument("--number", type=int, default=20, help="transforms timed per fixture")
+    args = parser.parse_args()
+    run(args.sequence_ms, args.number)
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark for the CORA field coding stage.
+
+Compares the compiled field plan used by ``CORATransformer._transform``
+with the previous approach of rebuilding the default and processor
+dictionaries from ``_defn`` for every submission.
+
+Run from the repository root::
+
+    python -m tests.bench_cora_transform
+
+"""
+from collections import OrderedDict
+import json
+import timeit
+
+from transform.transformers.cora_transformer import CORATransformer
+
+REPLIES = ["tests/replies/ukis-01.json", "tests/replies/ukis-02.json"]
+
+
+def rebuild_transform(data):
+    """The per-submission dictionary rebuild the field plan replaces."""
+    rv = OrderedDict([
+        ("{0:04}".format(i), val)
+        for rng, val, check, op in CORATransformer._defn
+        for i in rng
+    ])
+    ops = OrderedDict([
+        ("{0:04}".format(i), op)
+        for rng, val, check, op in CORATransformer._defn
+        for i in rng
+    ])
+    rv["2674"] = CORATransformer._Derivation.dontknow(("2672", "2673"), data, rv)
+    for q in rv:
+        try:
+            op = ops[q]
+        except KeyError:
+            continue
+        else:
+            rv[q] = op(q, data)
+    rv["0440"] = CORATransformer._Derivation.noneoftheabove(("0410", "0420", "0430"), data, rv)
+    rv["2671"] = CORATransformer._Derivation.noneoftheabove(("2668", "2669", "2670"), data, rv)
+    return rv
+
+
+def run(number=2000):
+    for path in REPLIES:
+        with open(path) as fp:
+            data = json.load(fp)["data"]
+
+        assert list(rebuild_transform(data).items()) == list(CORATransformer._transform(data).items())
+
+        before = timeit.timeit(lambda: rebuild_transform(data), number=number) / number
+        after = timeit.timeit(lambda: CORATransformer._transform(data), number=number) / number
+        print("{0}: rebuild {1:.1f}us, field plan {2:.1f}us ({3:.1f}x)".format(
+            path, before * 1e6, after * 1e6, before / after))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,44 @@
+"""
+Micro-benchmark for validating coded CORA fields.
+
+Measures the cost of ``CORATransformer._invalid_fields`` next to the
+coding it follows, and compares its precompiled checks with matching
+every field against its ``_Format`` pattern.
+
+Run from the repository root::
+
+    python -m tests.bench_cora_validation
+
+"""
+import json
+import timeit
+
+from transform.transformers.cora_transformer import CORATransformer
+
+REPLIES = ["tests/replies/ukis-01.json", "tests/replies/ukis-02.json"]
+
+
+def regex_invalid_fields(data):
+    """Every field matched against its pattern, the optional ones allowed to be empty."""
+    return [
+        (q, data[q]) for q, val, check, op in CORATransformer._plan
+        if not (val == "" and data[q] == "") and not check.value.match(data[q])
+    ]
+
+
+def run(number=5000):
+    for path in REPLIES:
+        with open(path) as fp:
+            data = CORATransformer._transform(json.load(fp)["data"])
+
+        assert regex_invalid_fields(data) == CORATransformer._invalid_fields(data)
+
+        transform = timeit.timeit(lambda: CORATransformer._transform(data), number=number) / number
+        regex = timeit.timeit(lambda: regex_invalid_fields(data), number=number) / number
+        fixed = timeit.timeit(lambda: CORATransformer._invalid_fields(data), number=number) / number
+        print("{0}: coding {1:.1f}us, regex checks {2:.1f}us, precompiled checks {3:.1f}us ({4:.0%} of coding)".format(
+            path, transform * 1e6, regex * 1e6, fixed * 1e6, fixed / transform))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,38 @@
+"""
+Micro-benchmark for formatting dates.
+
+Compares ``transform.dates.format_date`` with arrow, which it replaced, for
+the submission and creation times formatted for each image.
+
+Run from the repository root::
+
+    python -m tests.bench_dates
+
+"""
+from datetime import datetime
+import timeit
+
+import arrow
+
+from transform.dates import format_date
+
+VALUES = [
+    "2016-05-21T16:37:56.551Z",
+    datetime(2016, 10, 30, 0, 30),
+]
+
+
+def run(number=20000):
+    for value in VALUES:
+        for style, fmt in (("short", "YYYYMMDD"), ("long", "DD/MM/YYYY HH:mm:ss")):
+            assert arrow.get(value).to("Europe/London").format(fmt) == format_date(value, style)
+
+            with_arrow = timeit.timeit(lambda: arrow.get(value).to("Europe/London").format(fmt), number=number) / number
+            uncached = timeit.timeit(lambda: format_date.__wrapped__(value, style), number=number) / number
+            cached = timeit.timeit(lambda: format_date(value, style), number=number) / number
+            print("{0!r} {1}: arrow {2:.1f}us, format_date {3:.1f}us ({4:.1f}x), cached {5:.2f}us".format(
+                value, style, with_arrow * 1e6, uncached * 1e6, with_arrow / uncached, cached * 1e6))
+
+
+if __name__ == "__main__":
+    run()
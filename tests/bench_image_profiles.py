@@ -0,0 +1,66 @@
+"""
+Size and speed benchmark for image profiles.
+
+Makes the page images for the reply fixtures with a range of profiles,
+and reports the bytes per page and the time taken per page for each.
+
+Run from the repository root::
+
+    python -m tests.bench_image_profiles
+
+"""
+import json
+import time
+
+from transform.transformers.image_profile import ImageProfile
+from transform.transformers.pdf_transformer import PDFTransformer
+from transform.transformers.pdf_transformer_style_cora import cora_pdf_style
+from transform.transformers.rasteriser import SubprocessRasteriser, jpeg_frames
+
+REPLIES = ["tests/replies/ukis-01.json", "tests/replies/ukis-02.json"]
+
+PROFILES = [
+    ("default", ImageProfile(150, 75, False, False, False)),
+    ("optimised", ImageProfile(150, 75, False, False, True)),
+    ("progressive", ImageProfile(150, 75, False, True, True)),
+    ("grey", ImageProfile(150, 75, True, False, True)),
+    ("grey q60", ImageProfile(150, 60, True, False, True)),
+    ("grey 100dpi", ImageProfile(100, 75, True, False, True)),
+    ("grey 200dpi", ImageProfile(200, 75, True, False, True)),
+]
+
+
+def with_pdftoppm(pdf, page_count, profile):
+    return list(jpeg_frames(SubprocessRasteriser().rasterise(pdf, page_count, profile)))
+
+
+def measure(make, number):
+    make()
+    start = time.perf_counter()
+    for _ in range(number):
+        pages = make()
+    return (time.perf_counter() - start) / number, pages
+
+
+def run(number=5):
+    with open("transform/surveys/144.0001.json") as fp:
+        survey = json.load(fp)
+
+    pdfs = []
+    for path in REPLIES:
+        with open(path) as fp:
+            pdfs.append(PDFTransformer(survey, json.load(fp), cora_pdf_style).render_pages())
+
+    for name, profile in PROFILES:
+        seconds = size = page_count = 0
+        for pdf, pages in pdfs:
+            taken, images = measure(lambda: with_pdftoppm(pdf, pages, profile), number)
+            seconds += taken
+            size += sum(len(image) for image in images)
+            page_count += len(images)
+        print("{0:12}: {1:7.0f} bytes/page, {2:5.1f}ms/page".format(
+            name, size / page_count, seconds * 1000 / page_count))
+
+
+if __name__ == "__main__":
+    run()
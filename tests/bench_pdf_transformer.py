@@ -0,0 +1,44 @@
+"""
+Render-time benchmark for PDFTransformer.
+
+Renders each reply fixture with the survey's precompiled skeleton cached,
+and with it rebuilt for every render as it was before it was cached.
+
+Run from the repository root::
+
+    python -m tests.bench_pdf_transformer
+
+"""
+import json
+import timeit
+
+from transform.transformers import pdf_transformer
+from transform.transformers.pdf_transformer import PDFTransformer
+from transform.transformers.pdf_transformer_style_cora import CoraPdfTransformerStyle
+
+REPLIES = ["tests/replies/ukis-01.json", "tests/replies/ukis-02.json"]
+
+
+def run(number=50):
+    with open("transform/surveys/144.0001.json") as fp:
+        survey = json.load(fp)
+    style = CoraPdfTransformerStyle()
+
+    for path in REPLIES:
+        with open(path) as fp:
+            response = json.load(fp)
+
+        def cold():
+            pdf_transformer._skeletons.clear()
+            PDFTransformer(survey, response, style).render_pages()
+
+        def warm():
+            PDFTransformer(survey, response, style).render_pages()
+
+        before = timeit.timeit(cold, number=number) / number
+        after = timeit.timeit(warm, number=number) / number
+        print("{0}: rebuilt {1:.2f}ms, cached skeleton {2:.2f}ms".format(path, before * 1e3, after * 1e3))
+
+
+if __name__ == "__main__":
+    run()
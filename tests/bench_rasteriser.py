@@ -0,0 +1,66 @@
+"""
+Benchmark for the rasteriser.
+
+Rasterises the reply fixtures from several threads at once, as the
+threaded gunicorn workers do, and then times rasterising one pdf as its
+pages are split between more pdftoppm processes.
+
+Run from the repository root::
+
+    python -m tests.bench_rasteriser
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+
+from transform.transformers.pdf_transformer import PDFTransformer
+from transform.transformers.pdf_transformer_style_cora import CoraPdfTransformerStyle
+from transform.transformers.rasteriser import SubprocessRasteriser
+
+REPLIES = ["tests/replies/ukis-01.json", "tests/replies/ukis-02.json"]
+
+
+def load_pdfs():
+    with open("transform/surveys/144.0001.json") as fp:
+        survey = json.load(fp)
+    pdfs = []
+    for path in REPLIES:
+        with open(path) as fp:
+            pdfs.append(PDFTransformer(survey, json.load(fp), CoraPdfTransformerStyle()).render_pages())
+    return pdfs
+
+
+def throughput(rasteriser, pdfs, jobs, threads):
+    work = [pdfs[i % len(pdfs)] for i in range(jobs)]
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(rasteriser.rasterise, [pdf for pdf, _ in pdfs]))
+        start = time.perf_counter()
+        list(executor.map(rasteriser.rasterise, [pdf for pdf, _ in work]))
+        return jobs / (time.perf_counter() - start)
+
+
+def latency(rasteriser, pdf, page_count, number=5):
+    rasteriser.rasterise(pdf, page_count)
+    start = time.perf_counter()
+    for _ in range(number):
+        rasteriser.rasterise(pdf, page_count)
+    return (time.perf_counter() - start) / number
+
+
+def run(jobs=200, threads=8):
+    pdfs = load_pdfs()
+
+    rate = throughput(SubprocessRasteriser(), pdfs, jobs, threads)
+    print("{0} threads: {1:.1f} pdfs/s".format(threads, rate))
+
+    pdf, page_count = max(pdfs, key=lambda p: p[1])
+    serial = latency(SubprocessRasteriser(), pdf, page_count)
+    for workers in (1, 2, 4, 8):
+        seconds = latency(SubprocessRasteriser(workers), pdf, page_count)
+        print("{0} pages, {1} page workers: {2:.0f}ms ({3:.1f}x)".format(
+            page_count, workers, seconds * 1000, serial / seconds))
+
+
+if __name__ == "__main__":
+    run()
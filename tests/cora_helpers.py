@@ -0,0 +1,30 @@
+import datetime
+import json
+
+from transform.survey_registry import surveys
+from transform.transformers.cora_transformer import CORATransformer
+from transform.views.main import logger
+from transform.views.test_views import test_message
+
+# The time image index files are stamped with, fixed so transforms can be compared
+CURRENT_TIME = datetime.datetime(2017, 3, 1, 12, 30, 0)
+
+
+def cora_transformer(sequence_no=2345):
+    """A CORATransformer for test_message, with its image index time fixed"""
+    transformer = CORATransformer(logger, surveys.get("144", "0001"), json.loads(test_message), sequence_no)
+    transformer.image_transformer.current_time = CURRENT_TIME
+    return transformer
+
+
+def contents(entries):
+    return [(name, bytes(data) if isinstance(data, memoryview) else data) for name, data in entries]
+
+
+def cora_names(sequence_no, images):
+    """The files in a zip made from test_message, in order"""
+    names = ["EDC_QData/144_{0:04d}".format(sequence_no), "EDC_QReceipts/REC1203_{0:04d}.DAT".format(sequence_no)]
+    names += ["EDC_QImages/Images/S{0:09d}.JPG".format(image) for image in images]
+    names += ["EDC_QImages/Index/EDC_144_20160312_{0:04d}.csv".format(sequence_no),
+              "EDC_QJson/144_{0:04d}.json".format(sequence_no)]
+    return names
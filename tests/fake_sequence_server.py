@@ -0,0 +1,56 @@
+"""
+A local stand-in for sdx-sequence's image-sequence endpoint, for tests.
+"""
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import threading
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeSequenceServer:
+    """Serves /image-sequence?n= from an incrementing counter on a local port"""
+
+    def __init__(self, start=1):
+        self.next_number = start
+        self.requests = []
+        self.fail = False
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/image-sequence" or server.fail:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+
+                n = int(parse_qs(url.query)["n"][0])
+                with server._lock:
+                    server.requests.append(n)
+                    numbers = list(range(server.next_number, server.next_number + n))
+                    server.next_number += n
+
+                body = json.dumps({"sequence_list": numbers}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{0}".format(self._httpd.server_port)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,132 @@
+from transform import app
+from transform import settings
+from transform.transformers.image_transformer import ImageTransformer
+from transform.transformers.pdf_transformer import PDFTransformer
+from transform.views.test_views import test_message
+from tests.test_transform import get_file_as_string
+import unittest
+import io
+import json
+import zipfile
+from unittest.mock import patch
+
+
+class TestCoraBatchTransformService(unittest.TestCase):
+
+    transformEndpoint = "/cora/batch"
+
+    def setUp(self):
+
+        # creates a test client
+        self.app = app.test_client()
+
+        # propagate the exceptions to the test client
+        self.app.testing = True
+
+        self.responses = [
+            json.loads(test_message),
+            json.loads(get_file_as_string("./tests/replies/ukis-02.json")),
+        ]
+
+    def get_zip(self, endpoint, msg_data):
+        response = self.app.post(endpoint, data=msg_data)
+        self.assertEqual(200, response.status_code, response.data)
+        return zipfile.ZipFile(io.BytesIO(response.data))
+
+    @staticmethod
+    def get_manifest(z):
+        return json.loads(z.read('manifest.json').decode('utf-8'))
+
+    @patch('transform.transformers.cora_batch_transformer.allocate_image_sequence', return_value=[13, 14, 15, 16])
+    def test_creates_cora_batch(self, mock_sequence_list):
+        z = self.get_zip(self.transformEndpoint + "/2345", json.dumps(self.responses))
+
+        expected = [
+            'EDC_QData/144_2345',
+            'EDC_QReceipts/REC1203_2345.DAT',
+            'EDC_QImages/Images/S000000013.JPG',
+            'EDC_QImages/Images/S000000014.JPG',
+            'EDC_QImages/Index/EDC_144_20160312_2345.csv',
+            'EDC_QJson/144_2345.json',
+            'EDC_QData/144_2346',
+            'EDC_QReceipts/REC1101_2346.DAT',
+            'EDC_QImages/Images/S000000015.JPG',
+            'EDC_QImages/Images/S000000016.JPG',
+            'EDC_QImages/Index/EDC_144_20170111_2346.csv',
+            'EDC_QJson/144_2346.json',
+            'manifest.json'
+        ]
+        self.assertEqual(expected, z.namelist())
+
+        # Images for the whole batch come from a single allocation
+        mock_sequence_list.assert_called_once()
+        self.assertEqual(4, mock_sequence_list.call_args[0][1])
+
+        manifest = self.get_manifest(z)
+        self.assertEqual(["ok", "ok"], [item["status"] for item in manifest])
+        self.assertEqual([2345, 2346], [item["sequence_no"] for item in manifest])
+        self.assertEqual(expected[:6], manifest[0]["files"])
+
+    @patch('transform.transformers.cora_batch_transformer.allocate_image_sequence', return_value=[13, 14, 15, 16])
+    def test_creates_cora_batch_from_ndjson(self, mock_sequence_list):
+        body = "\n".join(json.dumps(response) for response in self.responses) + "\n"
+
+        z = self.get_zip(self.transformEndpoint, body)
+
+        self.assertIn('EDC_QData/144_1000', z.namelist())
+        self.assertIn('EDC_QData/144_1001', z.namelist())
+        self.assertEqual(["ok", "ok"], [item["status"] for item in self.get_manifest(z)])
+
+    @patch('transform.transformers.cora_batch_transformer.allocate_image_sequence', return_value=[13, 14])
+    def test_item_failures_reported_in_manifest(self, mock_sequence_list):
+        unsupported = json.loads(test_message)
+        unsupported['survey_id'] = '666'
+        unsupported['tx_id'] = 'unsupported-tx'
+        body = "\n".join([json.dumps(unsupported), "rubbish", json.dumps(self.responses[0])])
+
+        z = self.get_zip(self.transformEndpoint, body)
+
+        manifest = self.get_manifest(z)
+        self.assertEqual(["error", "error", "ok"], [item["status"] for item in manifest])
+        self.assertEqual("unsupported-tx", manifest[0]["tx_id"])
+        self.assertEqual(1002, manifest[2]["sequence_no"])
+        self.assertIn('EDC_QData/144_1002', z.namelist())
+        self.assertNotIn('EDC_QData/144_1000', z.namelist())
+
+    @patch('transform.transformers.cora_batch_transformer.allocate_image_sequence', return_value=[13, 14])
+    def test_invalid_fields_fail_item(self, mock_sequence_list):
+        self.responses[0]["data"]["0810"] = "1234"
+
+        with patch.object(settings, 'CORA_VALIDATION', 'strict'):
+            z = self.get_zip(self.transformEndpoint, json.dumps(self.responses))
+
+        manifest = self.get_manifest(z)
+        self.assertEqual(["error", "ok"], [item["status"] for item in manifest])
+        self.assertIn("0810='1234'", manifest[0]["error"])
+        self.assertNotIn('EDC_QData/144_1000', z.namelist())
+        # No images are numbered for the failed response
+        self.assertEqual(2, mock_sequence_list.call_args[0][1])
+
+    @patch('transform.transformers.cora_batch_transformer.allocate_image_sequence', return_value=[13, 14, 15, 16])
+    def test_each_pdf_rendered_once(self, mock_sequence_list):
+        transformers = set()
+        render = ImageTransformer.render
+
+        def track_render(transformer):
+            transformers.add(transformer)
+            return render(transformer)
+
+        with patch.object(ImageTransformer, 'render', track_render), \
+                patch.object(PDFTransformer, 'render_pages', autospec=True,
+                             side_effect=PDFTransformer.render_pages) as render_pages:
+            z = self.get_zip(self.transformEndpoint, json.dumps(self.responses))
+
+        self.assertEqual(2, render_pages.call_count)
+        self.assertEqual(["ok", "ok"], [item["status"] for item in self.get_manifest(z)])
+        # Each pdf is dropped once its files are in the zip
+        self.assertFalse(any(transformer._pdf for transformer in transformers))
+
+    def test_invalid_data(self):
+        r = self.app.post(self.transformEndpoint, data="rubbish")
+
+        self.assertEqual(r.status_code, 400)
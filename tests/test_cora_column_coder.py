@@ -0,0 +1,150 @@
+import itertools
+import json
+import random
+import unittest
+
+from transform.transformers.cora_column_coder import CORAColumnCoder
+from transform.transformers.cora_transformer import CORATransformer, CORAValidationError
+from tests.test_transform import get_file_as_string
+
+# Answers of every kind the processors handle, with some they don't
+ANSWERS = [
+    "Yes", "No", "yes", "no", "Don't know", "don’t know", "",
+    "Not important", "Low", "Medium", "High", "None", "Less than 40%", "40-90%", "Over 90%",
+    "0", "7", "12", "999", "123456", "1234567", "a comment", "   ",
+]
+
+
+def per_response_tkn(response):
+    return "".join(line + "\n" for line in CORATransformer._tkn_lines(
+        surveyCode=response["survey_id"],
+        ruRef=response["metadata"]["ru_ref"][:11],
+        period=response["collection"]["period"],
+        data=CORATransformer._transform(response["data"]),
+    ))
+
+
+class ColumnCoderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.coder = CORAColumnCoder()
+        self.replies = [
+            json.loads(get_file_as_string("./tests/replies/ukis-01.json")),
+            json.loads(get_file_as_string("./tests/replies/ukis-02.json")),
+        ]
+
+    def random_response(self, rng):
+        response = json.loads(json.dumps(self.replies[0]))
+        response["data"] = {
+            q: rng.choice(ANSWERS)
+            for q, val, check, op in CORATransformer._plan
+            if rng.random() < 0.7
+        }
+        return response
+
+    def test_questions(self):
+        self.assertEqual(
+            list(CORATransformer._transform({}).keys()),
+            list(self.coder.questions)
+        )
+
+    def test_replies_match_per_response(self):
+        expected = [per_response_tkn(r) for r in self.replies]
+        self.assertEqual(expected, self.coder.tkn(self.replies))
+
+    def test_random_responses_match_per_response(self):
+        rng = random.Random(0)
+        responses = [self.random_response(rng) for _ in range(300)]
+
+        results = self.coder.tkn(responses)
+
+        for response, result in zip(responses, results):
+            try:
+                expected = per_response_tkn(response)
+            except Exception as e:
+                self.assertIsInstance(result, type(e))
+            else:
+                self.assertEqual(expected, result)
+
+        # Some, but not all, of them had answers the processors reject
+        errors = sum(1 for result in results if isinstance(result, Exception))
+        self.assertTrue(0 < errors < len(results))
+
+    def test_error_in_one_response(self):
+        bad = json.loads(json.dumps(self.replies[0]))
+        bad["data"]["0810"] = "ten"
+        del self.replies[1]["metadata"]
+
+        results = self.coder.tkn([self.replies[0], bad, self.replies[1]])
+
+        self.assertEqual(per_response_tkn(self.replies[0]), results[0])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIsInstance(results[2], KeyError)
+
+    def test_unhashable_answer(self):
+        response = self.replies[0]
+        response["data"]["0210"] = ["checked"]
+        self.assertEqual([per_response_tkn(response)], self.coder.tkn([response]))
+
+    def test_on_invalid(self):
+        self.replies[1]["data"]["0810"] = "1234"
+        self.replies[1]["data"]["2510"] = "12a"
+        calls = []
+
+        results = self.coder.tkn(self.replies, on_invalid=lambda i, fields: calls.append((i, fields)))
+
+        self.assertEqual([(1, [("0810", "1234"), ("2510", "12a")])], calls)
+        self.assertEqual([per_response_tkn(r) for r in self.replies], results)
+
+    def test_on_invalid_raises(self):
+        self.replies[0]["data"]["0810"] = "1234"
+
+        def on_invalid(i, fields):
+            raise CORAValidationError(fields)
+
+        results = self.coder.tkn(self.replies, on_invalid=on_invalid)
+
+        self.assertIsInstance(results[0], CORAValidationError)
+        self.assertEqual(per_response_tkn(self.replies[1]), results[1])
+
+    def test_empty(self):
+        self.assertEqual([], self.coder.tkn([]))
+
+    def test_code_matches_transform(self):
+        datas = [r["data"] for r in self.replies]
+        for data, answers in zip(datas, self.coder.code(datas)):
+            self.assertEqual(
+                list(CORATransformer._transform(data).items()),
+                list(answers.items())
+            )
+
+        # The same answers repeated across many submissions
+        datas = list(itertools.islice(itertools.cycle(datas), 50))
+        self.assertEqual(
+            [list(CORATransformer._transform(d).items()) for d in datas],
+            [list(answers.items()) for answers in self.coder.code(datas)]
+        )
+
+    def test_null_answer(self):
+        response = self.replies[0]
+        response["data"]["0210"] = None
+        response["data"]["0410"] = None
+        with self.assertRaises(AttributeError):
+            per_response_tkn(response)
+        self.assertIsInstance(self.coder.tkn([response])[0], AttributeError)
+
+        del response["data"]["0410"]
+        self.assertEqual([per_response_tkn(response)], self.coder.tkn([response]))
+
+    def test_numeric_answers_not_strings(self):
+        null, number = json.loads(json.dumps(self.replies[0])), json.loads(json.dumps(self.replies[0]))
+        null["data"]["2510"] = None
+        number["data"]["2801"] = 12
+
+        results = self.coder.tkn([null, self.replies[1], number])
+
+        for response, result in ((null, results[0]), (number, results[2])):
+            with self.assertRaises(TypeError):
+                per_response_tkn(response)
+            self.assertIsInstance(result, TypeError)
+        self.assertEqual(per_response_tkn(self.replies[1]), results[1])
@@ -0,0 +1,60 @@
+import io
+import unittest
+import zipfile
+from unittest.mock import patch
+
+from tests.cora_helpers import contents, cora_names, cora_transformer
+from transform import app
+from transform import settings
+from transform.transformers.rasteriser import RasterisationError
+from transform.views.test_views import test_message
+
+
+@patch('transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list', return_value=[13, 14])
+class TestCoraPipeline(unittest.TestCase):
+
+    def test_entries_match_sequential(self, mock_sequence_no):
+        expected = contents(cora_transformer().get_entries())
+
+        with patch.object(settings, "CORA_PIPELINE", True):
+            actual = contents(cora_transformer().get_entries())
+
+        self.assertEqual(expected, actual)
+
+    def test_entries_match_sequential_with_num_sequence(self, mock_sequence_no):
+        expected = contents(cora_transformer().get_entries(iter(range(1000, 1100))))
+
+        with patch.object(settings, "CORA_PIPELINE", True):
+            actual = contents(cora_transformer().get_entries(iter(range(1000, 1100))))
+
+        self.assertEqual(expected, actual)
+        mock_sequence_no.assert_not_called()
+
+    def test_stages_are_timed(self, mock_sequence_no):
+        transformer = cora_transformer()
+
+        with patch.object(settings, "CORA_PIPELINE", True):
+            list(transformer.get_entries())
+
+        self.assertEqual({"render", "image_sequence", "rasterise", "index", "idbr", "tkn", "response_json"},
+                         set(transformer.timer.timings))
+
+    def test_failed_stage(self, mock_sequence_no):
+        transformer = cora_transformer()
+
+        with patch.object(settings, "CORA_PIPELINE", True), \
+                patch('transform.transformers.image_transformer.get_rasteriser') as get_rasteriser:
+            get_rasteriser.return_value.rasterise.side_effect = RasterisationError("pdftoppm failed", "error")
+            with self.assertRaises(RasterisationError):
+                list(transformer.get_entries())
+
+        self.assertEqual("rasterise", transformer.timer.failed)
+
+    def test_cora_endpoint(self, mock_sequence_no):
+        client = app.test_client()
+
+        with patch.object(settings, "CORA_PIPELINE", True):
+            response = client.post("/cora/2345", data=test_message)
+
+        z = zipfile.ZipFile(io.BytesIO(response.data))
+        self.assertEqual(cora_names(2345, [13, 14]), z.namelist())
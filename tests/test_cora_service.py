@@ -1,4 +1,6 @@
 from transform import app
+from transform import settings
+from transform.transformers.rasteriser import RasterisationError
 from transform.views.test_views import test_message
 import unittest
 import io
@@ -91,6 +93,77 @@ class TestCoraTransformService(unittest.TestCase):
 
         self.assertEquals(actual_json_data, expected_json_data)
 
+    @patch('transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list', return_value=[13, 14])
+    def test_streamed_zip_matches(self, mock_sequence_no):
+        """A streamed zip holds the same files as one built in memory"""
+        expected = zipfile.ZipFile(self.get_zip_file_contents(self.transformEndpoint + "/2345"))
+
+        with patch.object(settings, 'CORA_STREAM_RESPONSE', True):
+            response = self.app.post(self.transformEndpoint + "/2345", data=test_message)
+        self.assertIsNone(response.content_length)
+        actual = zipfile.ZipFile(io.BytesIO(response.data))
+
+        self.assertIsNone(actual.testzip())
+        self.assertEqual(expected.namelist(), actual.namelist())
+        for name in ('EDC_QData/144_2345', 'EDC_QReceipts/REC1203_2345.DAT',
+                     'EDC_QImages/Images/S000000013.JPG', 'EDC_QJson/144_2345.json'):
+            self.assertEqual(expected.read(name), actual.read(name))
+
+    @patch('transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list', return_value=[13, 14])
+    def test_streamed_corrupt_page(self, mock_sequence_no):
+        """A corrupt page after the first fails before a streamed response starts"""
+        jpeg = b"\xFF\xD8\xFF\xDA\x00\x02\x01\x02\xFF\xD9"
+
+        with patch.object(settings, 'CORA_STREAM_RESPONSE', True), \
+                patch('transform.transformers.image_transformer.get_rasteriser') as get_rasteriser:
+            get_rasteriser.return_value.rasterise.return_value = jpeg + b"\xFF\xD8\xFF\xDA\x00\x02\x01"
+            response = self.app.post(self.transformEndpoint + "/2345", data=test_message)
+
+        self.assertEqual(500, response.status_code)
+
+    @patch('transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list', return_value=[13, 14])
+    def test_images_corrupt_page(self, mock_sequence_no):
+        """Rasteriser output which isn't whole jpegs is a server error, not the client's"""
+        with patch('transform.transformers.image_transformer.get_rasteriser') as get_rasteriser:
+            get_rasteriser.return_value.rasterise.return_value = b"\xFF\xD8\xFF\xDA\x00\x02\x01"
+            response = self.app.post("/images", data=test_message)
+
+        self.assertEqual(500, response.status_code)
+        self.assertEqual("corrupt_output", json.loads(response.data.decode("utf-8"))["diagnostics"]["reason"])
+
+    @patch('transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list', return_value=[13, 14])
+    def test_validation(self, mock_sequence_no):
+        """Coded fields which don't match their formats are rejected in strict mode"""
+        msg = json.loads(test_message)
+        msg["data"]["0810"] = "1234"
+
+        with patch.object(settings, 'CORA_VALIDATION', 'strict'):
+            r = self.app.post(self.transformEndpoint, data=json.dumps(msg))
+        self.assertEqual(400, r.status_code)
+        self.assertIn("0810='1234'", json.loads(r.data.decode("utf-8"))["message"])
+
+        with patch.object(settings, 'CORA_VALIDATION', 'warn'):
+            r = self.app.post(self.transformEndpoint, data=json.dumps(msg))
+        self.assertEqual(200, r.status_code)
+
+    @patch('transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list', return_value=[13, 14])
+    def test_rasterisation_error(self, mock_sequence_no):
+        """A pdf which can't be rasterised is a server error, saying why"""
+        error = RasterisationError("images:pdftoppm timed out after 60s", "timeout", seconds=60.2, pages="all")
+
+        for endpoint in (self.transformEndpoint, "/images"):
+            with self.subTest(endpoint=endpoint), \
+                    patch('transform.transformers.image_transformer.get_rasteriser') as get_rasteriser:
+                get_rasteriser.return_value.rasterise.side_effect = error
+                r = self.app.post(endpoint, data=test_message)
+
+            self.assertEqual(500, r.status_code)
+            body = json.loads(r.data.decode("utf-8"))
+            self.assertIn("timed out", body["message"])
+            self.assertEqual("timeout", body["diagnostics"]["reason"])
+            self.assertEqual("rasterise", body["diagnostics"]["stage"])
+            self.assertIn("render_ms", body["diagnostics"]["timings"])
+
     def test_invalid_data(self):
         r = self.app.post(self.transformEndpoint, data="rubbish")
 
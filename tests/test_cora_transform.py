@@ -8,9 +8,11 @@ import unittest
 import pkg_resources
 
 from PyPDF2 import PdfFileReader
+from transform.transformers import cora_transformer
 from transform.transformers.cora_transformer import CORATransformer
 from transform import settings
-from unittest.mock import patch
+from transform.survey_registry import surveys
+from unittest.mock import Mock, patch
 
 
 class FormatTests(unittest.TestCase):
@@ -26,6 +28,8 @@ class FormatTests(unittest.TestCase):
         self.assertFalse(CORATransformer._Format.yesno.value.match("Yes"))
         self.assertFalse(CORATransformer._Format.yesno.value.match("No"))
         self.assertFalse(CORATransformer._Format.yesno.value.match("Don't know"))
+        self.assertFalse(CORATransformer._Format.yesno.value.match("yesterday"))
+        self.assertFalse(CORATransformer._Format.yesno.value.match("snow"))
 
     def test_check_yesnodk(self):
         self.assertTrue(CORATransformer._Format.yesnodk.value.match("yes"))
@@ -34,6 +38,8 @@ class FormatTests(unittest.TestCase):
         self.assertFalse(CORATransformer._Format.yesnodk.value.match("Yes"))
         self.assertFalse(CORATransformer._Format.yesnodk.value.match("No"))
         self.assertFalse(CORATransformer._Format.yesnodk.value.match("Don't know"))
+        self.assertFalse(CORATransformer._Format.yesnodk.value.match("yesterday"))
+        self.assertFalse(CORATransformer._Format.yesnodk.value.match("know don't know"))
 
     def test_check_twodigits(self):
         """
@@ -127,6 +133,64 @@ class FormatTests(unittest.TestCase):
                     self.fail(v)
 
 
+class ValidationTests(unittest.TestCase):
+    """
+    Checks coded values are validated against their formats.
+
+    """
+
+    def test_fixed_checks_match_formats(self):
+        values = ["", "0", "1", "2", "9", "00", "01", "10", "11", "12", "000", "0001", "0100", "1100",
+                  "123456", "1234567", "12345678", "-1", "1.0", " 1", "1 ", "1\n", "\u0663", "yes", "a"]
+        for name, check in cora_transformer._FIXED_CHECKS.items():
+            pattern = CORATransformer._Format[name].value
+            for value in values:
+                with self.subTest(format=name, value=value):
+                    self.assertEqual(
+                        bool(pattern.match(value)) and not value.endswith("\n"),
+                        check(value)
+                    )
+
+    def test_optional_fields(self):
+        self.assertTrue(CORATransformer._validators["1410"](""))
+        self.assertTrue(CORATransformer._validators["1410"]("12"))
+        self.assertFalse(CORATransformer._validators["0210"](""))
+
+    def test_invalid_fields(self):
+        data = CORATransformer._transform({"0810": "1234", "2510": "12a", "2800": "7"})
+        self.assertEqual(
+            [("0810", "1234"), ("2510", "12a")],
+            CORATransformer._invalid_fields(data)
+        )
+
+    def test_replies_are_valid(self):
+        for path in ("tests/replies/ukis-01.json", "tests/replies/ukis-02.json"):
+            with open(path) as fp:
+                data = json.load(fp)["data"]
+            with self.subTest(path=path):
+                self.assertEqual([], CORATransformer._invalid_fields(CORATransformer._transform(data)))
+
+    def test_modes(self):
+        with open("tests/replies/ukis-01.json") as fp:
+            response = json.load(fp)
+        response["data"]["0810"] = "1234"
+        survey = surveys.get("144", "0001")
+        logger = Mock()
+
+        with patch.object(settings, "CORA_VALIDATION", "strict"):
+            with self.assertRaises(cora_transformer.CORAValidationError) as cm:
+                CORATransformer(logger, survey, response)._create_tkn()
+            self.assertEqual([("0810", "1234")], cm.exception.fields)
+
+        with patch.object(settings, "CORA_VALIDATION", "warn"):
+            CORATransformer(logger, survey, response)._create_tkn()
+        logger.warning.assert_called_once_with("CORA:coded fields do not match their formats", fields=["0810='1234'"])
+
+        with patch.object(settings, "CORA_VALIDATION", "off"):
+            CORATransformer(logger, survey, response)._create_tkn()
+        logger.warning.assert_called_once()
+
+
 class TransformTests(unittest.TestCase):
 
     def test_initial_defaults(self):
@@ -140,6 +204,18 @@ class TransformTests(unittest.TestCase):
         rv = CORATransformer._transform({})
         self.assertEqual(len(ref) + 3, len(rv))
 
+    def test_plan_order(self):
+        """
+        Check the field plan preserves definition order with derived fields last.
+
+        """
+        expected = [
+            "{0:04}".format(i) for rng, val, check, op in CORATransformer._defn for i in rng
+        ] + ["2674", "0440", "2671"]
+        rv = CORATransformer._transform({})
+        self.assertIsInstance(CORATransformer._plan, tuple)
+        self.assertEqual(expected, list(rv.keys()))
+
     def test_elimination(self):
         """
         Test that pure routing fields are removed.
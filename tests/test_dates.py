@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+import unittest
+
+import arrow
+
+from transform import dates
+
+ARROW_FORMATS = {
+    "short": "YYYYMMDD",
+    "long": "DD/MM/YYYY HH:mm:ss",
+    "written": "DD MMMM YYYY HH:mm:ss",
+}
+
+
+def arrow_format(value, style, tz=dates.UK):
+    return arrow.get(value).to(tz).format(ARROW_FORMATS[style])
+
+
+def around(moment, hours=3, step=timedelta(minutes=7)):
+    """Times either side of a moment"""
+    t = moment - timedelta(hours=hours)
+    while t < moment + timedelta(hours=hours):
+        yield t
+        t += step
+
+
+class TestDates(unittest.TestCase):
+
+    def assertMatchesArrow(self, value, tz=dates.UK):
+        for style in ARROW_FORMATS:
+            with self.subTest(value=value, style=style, tz=tz):
+                self.assertEqual(arrow_format(value, style, tz), dates.format_date(value, style, tz))
+
+    def test_dst_boundaries(self):
+        # Clocks go forward at 01:00 UTC on the last Sunday of March and back at 01:00 UTC on the last Sunday of October
+        for boundary in (datetime(2016, 3, 27, 1), datetime(2016, 10, 30, 1),
+                         datetime(2017, 3, 26, 1), datetime(2017, 10, 29, 1)):
+            for t in around(boundary):
+                self.assertMatchesArrow(t)
+                self.assertMatchesArrow(t.replace(tzinfo=timezone.utc))
+                self.assertMatchesArrow(t.replace(tzinfo=timezone(timedelta(hours=-5))))
+                self.assertMatchesArrow(t.isoformat() + "Z")
+                self.assertMatchesArrow(t.isoformat() + "+01:00")
+
+    def test_year(self):
+        t = datetime(2016, 1, 1)
+        while t < datetime(2017, 1, 1):
+            self.assertMatchesArrow(t)
+            t += timedelta(hours=13, minutes=37, seconds=11)
+
+    def test_other_timezones(self):
+        for tz in ("US/Pacific", "Asia/Shanghai", "Europe/Moscow"):
+            for t in around(datetime(2016, 3, 13, 10), hours=12, step=timedelta(minutes=47)):
+                self.assertMatchesArrow(t.isoformat() + "Z", tz)
+
+    def test_styles(self):
+        value = datetime(2016, 7, 5, 8, 9, 10)
+        self.assertEqual("20160705", dates.format_date(value, "short"))
+        self.assertEqual("05/07/2016 09:09:10", dates.format_date(value))
+        self.assertEqual("05 July 2016 09:09:10", dates.format_date(value, "written"))
+        # A style equal to, but not the same object as, "short"
+        self.assertEqual("20160705", dates.format_date(value, "".join(["sh", "ort"])))
+        self.assertEqual("05/07/2016 09:09:10", dates.format_date(value, "unknown"))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            dates.format_date(datetime(2016, 7, 5), "long", "Nowhere/Special")
+        with self.assertRaises(TypeError):
+            dates.format_date(1467705600)
@@ -0,0 +1,76 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from transform import settings
+from transform.transformers.formatters import format_idbr, format_index
+from tests.test_transform import get_file_as_string
+
+IMAGES_PATH = "\\\\NP3-------370\\SDX_preprod\\EDC_QImages\\Images"
+CREATION_TIME = {"long": "15/03/2016 10:05:03", "short": "20160315"}
+
+
+def load(path):
+    return json.loads(get_file_as_string(path))
+
+
+def variations(response):
+    """The response with each of the fields the formats use changed in ways
+    the templates' filters treat differently"""
+    for ru_ref in ("12345678901A", "12345678901", "123", ""):
+        for period in ("201605", "1605", "16", "20160501", ""):
+            for survey_id in ("144", "7", "abc", 144, "1.5"):
+                varied = json.loads(json.dumps(response))
+                varied["metadata"]["ru_ref"] = ru_ref
+                varied["collection"]["period"] = period
+                varied["survey_id"] = survey_id
+                yield varied
+
+
+class TestFormatters(unittest.TestCase):
+    """The direct formatters against the templates they replace"""
+
+    def setUp(self):
+        self.responses = [
+            load("tests/idbr/144.0001.json"),
+            load("tests/csv/valid.144.0001.json"),
+            load("tests/replies/ukis-01.json"),
+        ]
+
+    def test_idbr_golden(self):
+        self.assertEqual(get_file_as_string("tests/idbr/144.0001.idbr").rstrip("\n"), format_idbr(self.responses[0]))
+
+    def test_idbr_matches_template(self):
+        for response in self.responses:
+            for varied in variations(response):
+                with self.subTest(survey_id=varied["survey_id"], ru_ref=varied["metadata"]["ru_ref"],
+                                  period=varied["collection"]["period"]):
+                    with patch.object(settings, "RENDER_WITH_TEMPLATES", True):
+                        expected = format_idbr(varied)
+                    self.assertEqual(expected, format_idbr(varied))
+
+    def test_index_matches_template(self):
+        for images in ([], ["S000000001.JPG"], ["S{0:09}.JPG".format(i) for i in range(1, 1201)]):
+            for response in self.responses:
+                for varied in variations(response):
+                    with self.subTest(images=len(images), survey_id=varied["survey_id"],
+                                      ru_ref=varied["metadata"]["ru_ref"], period=varied["collection"]["period"]):
+                        with patch.object(settings, "RENDER_WITH_TEMPLATES", True):
+                            expected = format_index(varied, images, CREATION_TIME, IMAGES_PATH)
+                        self.assertEqual(expected, format_index(varied, images, CREATION_TIME, IMAGES_PATH))
+
+    def test_missing_fields_match_template(self):
+        response = self.responses[0]
+        del response["collection"]["period"]
+        del response["collection"]["instrument_id"]
+
+        with patch.object(settings, "RENDER_WITH_TEMPLATES", True):
+            expected = (format_idbr(response), format_index(response, ["S000000001.JPG"], CREATION_TIME, IMAGES_PATH))
+        self.assertEqual(expected, (format_idbr(response), format_index(response, ["S000000001.JPG"], CREATION_TIME, IMAGES_PATH)))
+
+        del response["survey_id"]
+        with patch.object(settings, "RENDER_WITH_TEMPLATES", True):
+            with self.assertRaises(Exception):
+                format_idbr(response)
+        with self.assertRaises(KeyError):
+            format_idbr(response)
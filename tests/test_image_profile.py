@@ -0,0 +1,112 @@
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+from structlog import wrap_logger
+
+from transform import settings
+from transform.result_cache import result_key
+from transform.survey_registry import SURVEYS_DIR, SurveyRegistry
+from transform.transformers.image_profile import ImageProfile, default_profile, get_image_profile
+from transform.transformers.image_transformer import ImageTransformer
+from transform.transformers.pdf_transformer import PDFTransformer
+from transform.transformers.pdf_transformer_style_cora import cora_pdf_style
+from transform.transformers.rasteriser import SubprocessRasteriser, jpeg_frames
+from transform.views.test_views import test_message
+
+
+def open_image(jpeg):
+    return Image.open(io.BytesIO(jpeg))
+
+
+class TestImageProfile(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(SURVEYS_DIR, "144.0001.json")) as fp:
+            cls.survey = json.load(fp)
+        cls.response = json.loads(test_message)
+
+    def test_default_profile_is_pdftoppms(self):
+        self.assertEqual(ImageProfile(150, 75, False, False, False), default_profile())
+        self.assertEqual([], default_profile().pdftoppm_args())
+
+    def test_settings(self):
+        with patch.object(settings, "IMAGE_DPI", 100), patch.object(settings, "IMAGE_GREY", True):
+            self.assertEqual(ImageProfile(100, 75, True, False, False), default_profile())
+
+    def test_survey_profile(self):
+        survey = dict(self.survey, image_profile={"dpi": 200, "progressive": True})
+
+        self.assertEqual(ImageProfile(200, 75, False, True, False), get_image_profile(survey))
+        self.assertEqual(default_profile(), get_image_profile(self.survey))
+
+    def test_pdftoppm_args(self):
+        self.assertEqual(["-r", "100", "-gray", "-jpegopt", "quality=50,progressive=y,optimize=y"],
+                         ImageProfile(100, 50, True, True, True).pdftoppm_args())
+        self.assertEqual(["-jpegopt", "optimize=y"], ImageProfile(150, 75, False, False, True).pdftoppm_args())
+
+    def test_pdftoppm(self):
+        pdf, page_count = PDFTransformer(self.survey, self.response, cora_pdf_style).render_pages()
+        rasteriser = SubprocessRasteriser()
+
+        default = [open_image(frame) for frame in jpeg_frames(rasteriser.rasterise(pdf, page_count))]
+        profiled = [open_image(frame) for frame in jpeg_frames(
+            rasteriser.rasterise(pdf, page_count, ImageProfile(75, 50, True, False, False)))]
+
+        self.assertEqual(len(default), len(profiled))
+        for before, after in zip(default, profiled):
+            self.assertEqual("L", after.mode)
+            self.assertAlmostEqual(before.size[0] / 2, after.size[0], delta=1)
+
+    def test_image_transformer_uses_survey_profile(self):
+        survey = dict(self.survey, image_profile={"dpi": 100, "grey": True})
+
+        with patch("transform.transformers.image_transformer.get_rasteriser") as get_rasteriser:
+            get_rasteriser.return_value.rasterise.return_value = b""
+            transformer = ImageTransformer(wrap_logger(logging.getLogger(__name__)), survey, self.response,
+                                           cora_pdf_style)
+            list(transformer.get_image_entries(iter(range(1, 100))))
+
+        profile = get_rasteriser.return_value.rasterise.call_args[0][2]
+        self.assertEqual(ImageProfile(100, 75, True, False, False), profile)
+
+    def test_cache_key_includes_profile(self):
+        self.assertNotEqual(result_key(self.response, 1000, "v1", default_profile()),
+                            result_key(self.response, 1000, "v1", default_profile()._replace(grey=True)))
+
+
+class TestSurveyImageProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_survey(self, image_profile):
+        with open(os.path.join(SURVEYS_DIR, "144.0001.json")) as fp:
+            survey = json.load(fp)
+        survey["image_profile"] = image_profile
+        with open(os.path.join(self.directory, "144.0001.json"), "w") as fp:
+            json.dump(survey, fp)
+
+    def test_valid_profile(self):
+        self.write_survey({"dpi": 100, "quality": 60, "grey": True, "progressive": True, "optimise": True})
+
+        survey = SurveyRegistry(self.directory).get("144", "0001")
+
+        self.assertEqual(ImageProfile(100, 60, True, True, True), get_image_profile(survey))
+
+    def test_invalid_profiles(self):
+        for image_profile in ({"dpi": 10}, {"dpi": "150"}, {"quality": 101}, {"grey": "yes"}, {"colour": True}):
+            with self.subTest(image_profile=image_profile):
+                self.write_survey(image_profile)
+                with self.assertRaises(ValueError):
+                    SurveyRegistry(self.directory)
@@ -0,0 +1,132 @@
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from transform import settings
+from transform.transformers import image_sequence
+from transform.transformers.image_sequence import ImageSequenceAllocator, ImageSequenceError, allocate_image_sequence
+from tests.fake_sequence_server import FakeSequenceServer
+
+
+class TestImageSequenceAllocator(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeSequenceServer(start=100).start()
+        patcher = patch.object(settings, 'SDX_SEQUENCE_URL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.server.stop)
+
+        self.state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.state_dir)
+
+    def test_allocates_from_block(self):
+        allocator = ImageSequenceAllocator(10, low_water=0)
+
+        self.assertEqual([100, 101], allocator.allocate(2))
+        self.assertEqual([102, 103, 104], allocator.allocate(3))
+        self.assertEqual([10], self.server.requests)
+        self.assertEqual(5, allocator.remaining())
+
+    def test_allocation_larger_than_block(self):
+        allocator = ImageSequenceAllocator(4, low_water=0)
+
+        self.assertEqual(list(range(100, 106)), allocator.allocate(6))
+        self.assertEqual([6], self.server.requests)
+
+    def test_refills_in_background(self):
+        allocator = ImageSequenceAllocator(10, low_water=5)
+
+        allocator.allocate(6)
+        allocator.close()
+
+        self.assertEqual([10, 10], self.server.requests)
+        self.assertEqual(14, allocator.remaining())
+        self.assertEqual(list(range(106, 116)), allocator.allocate(10))
+
+    def test_unused_numbers_survive_restart(self):
+        allocator = ImageSequenceAllocator(10, low_water=0, state_dir=self.state_dir)
+        self.assertEqual([100, 101, 102], allocator.allocate(3))
+        allocator.close()
+
+        restarted = ImageSequenceAllocator(10, low_water=0, state_dir=self.state_dir)
+
+        self.assertEqual([103, 104], restarted.allocate(2))
+        self.assertEqual([10], self.server.requests)
+        restarted.close()
+
+    def test_state_written_on_claim_and_close_only(self):
+        allocator = ImageSequenceAllocator(10, low_water=0, state_dir=self.state_dir)
+
+        with patch.object(image_sequence.os, 'fsync') as fsync:
+            for _ in range(3):
+                allocator.allocate(2)
+            fsync.assert_not_called()
+
+            allocator.close()
+            fsync.assert_called_once()
+
+    def test_numbers_not_reused_after_crash(self):
+        allocator = ImageSequenceAllocator(10, low_water=0, state_dir=self.state_dir)
+        allocator.close()
+        restarted = ImageSequenceAllocator(10, low_water=0, state_dir=self.state_dir)
+        self.assertEqual([100, 101, 102], restarted.allocate(3))
+
+        # Dies without closing, releasing its state file's lock
+        restarted._state_lock.close()
+
+        recovered = ImageSequenceAllocator(10, low_water=0, state_dir=self.state_dir)
+        self.assertEqual([110, 111], recovered.allocate(2))
+        recovered.close()
+
+    def test_fetches_without_holding_lock(self):
+        allocator = ImageSequenceAllocator(10, low_water=0)
+        allocator.allocate(8)
+        fetching = threading.Event()
+        release = threading.Event()
+        fetch = allocator._fetch
+
+        def slow_fetch(n):
+            fetching.set()
+            self.assertTrue(release.wait(5))
+            return fetch(n)
+
+        with patch.object(allocator, '_fetch', slow_fetch):
+            waiting = threading.Thread(target=allocator.allocate, args=(5,))
+            waiting.start()
+            self.assertTrue(fetching.wait(5))
+
+            # The numbers left are still handed out while the block is fetched
+            self.assertEqual([108, 109], allocator.allocate(2))
+
+            release.set()
+            waiting.join(5)
+
+        self.assertEqual([10, 10], self.server.requests)
+        self.assertEqual(5, allocator.remaining())
+
+    def test_workers_claim_separate_state(self):
+        first = ImageSequenceAllocator(10, low_water=0, state_dir=self.state_dir)
+        second = ImageSequenceAllocator(10, low_water=0, state_dir=self.state_dir)
+
+        numbers = first.allocate(3) + second.allocate(3)
+
+        self.assertEqual(len(numbers), len(set(numbers)))
+        first.close()
+        second.close()
+
+    def test_sequence_unavailable(self):
+        self.server.fail = True
+        allocator = ImageSequenceAllocator(10)
+
+        with self.assertRaises(ImageSequenceError):
+            allocator.allocate(2)
+
+    def test_allocate_per_request(self):
+        with patch.object(settings, 'IMAGE_SEQUENCE_BLOCK_SIZE', 0):
+            self.assertEqual([100, 101], allocate_image_sequence(image_sequence.logger, 2))
+            self.server.fail = True
+            with self.assertRaises(ImageSequenceError):
+                allocate_image_sequence(image_sequence.logger, 2)
@@ -0,0 +1,89 @@
+import io
+import unittest
+import zipfile
+
+from transform.transformers.in_memory_zip import InMemoryZip, stream_zip
+
+
+class TestInMemoryZip(unittest.TestCase):
+
+    def test_append_many(self):
+        z = InMemoryZip()
+        names = ["EDC_QImages/Images/S{0:09}.JPG".format(i) for i in range(50)]
+        for name in names:
+            z.append(name, b"\xFF\xD8image\xFF\xD9")
+        z.append("EDC_QData/144_1000", "144:49900015425:1:201612:0:0510:2\n" * 100)
+
+        self.assertEqual(names + ["EDC_QData/144_1000"], z.get_filenames())
+
+        with zipfile.ZipFile(z.in_memory_zip) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zipfile.ZIP_STORED, zf.getinfo(names[0]).compress_type)
+            self.assertEqual(zipfile.ZIP_DEFLATED, zf.getinfo("EDC_QData/144_1000").compress_type)
+            self.assertEqual(b"\xFF\xD8image\xFF\xD9", zf.read(names[0]))
+
+    def test_compress_type_override(self):
+        z = InMemoryZip()
+        z.append("S000000001.JPG", b"image", zipfile.ZIP_DEFLATED)
+        z.append("144_1000", "data", zipfile.ZIP_STORED)
+
+        with zipfile.ZipFile(z.in_memory_zip) as zf:
+            self.assertEqual(zipfile.ZIP_DEFLATED, zf.getinfo("S000000001.JPG").compress_type)
+            self.assertEqual(zipfile.ZIP_STORED, zf.getinfo("144_1000").compress_type)
+
+    def test_append_after_rewind(self):
+        z = InMemoryZip()
+        z.append("first", "1")
+        z.rewind()
+        z.append("second", "2")
+        z.rewind()
+
+        with zipfile.ZipFile(z.in_memory_zip) as zf:
+            self.assertEqual(["first", "second"], zf.namelist())
+            self.assertEqual(b"2", zf.read("second"))
+
+
+class TestStreamZip(unittest.TestCase):
+
+    def test_closed_when_appending_fails(self):
+        z = InMemoryZip()
+
+        with self.assertRaises(ValueError):
+            with z:
+                z.append("EDC_QData/144_1000", "144:49900015425:1:201612:0:0510:2\n")
+                raise ValueError()
+
+        self.assertIsNone(z._zip_file)
+        with zipfile.ZipFile(z.in_memory_zip) as zf:
+            self.assertEqual(["EDC_QData/144_1000"], zf.namelist())
+
+    def test_stream_zip(self):
+        entries = [
+            ("EDC_QData/144_1000", "144:49900015425:1:201612:0:0510:2\n"),
+            ("EDC_QImages/Images/S000000001.JPG", memoryview(b"\xFF\xD8image\xFF\xD9")),
+            ("EDC_QJson/144_1000.json", "{}"),
+        ]
+
+        chunks = list(stream_zip(iter(entries)))
+
+        self.assertTrue(all(isinstance(chunk, bytes) for chunk in chunks))
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual([name for name, _ in entries], zf.namelist())
+            self.assertEqual(b"\xFF\xD8image\xFF\xD9", zf.read("EDC_QImages/Images/S000000001.JPG"))
+            for info in zf.infolist():
+                # Sizes follow each entry in a data descriptor
+                self.assertTrue(info.flag_bits & 0x08)
+
+    def test_entries_written_as_produced(self):
+        produced = []
+
+        def entries():
+            for i in range(3):
+                produced.append(i)
+                yield "file{0}".format(i), "contents"
+
+        stream = stream_zip(entries())
+        next(stream)
+
+        self.assertEqual([0], produced)
@@ -0,0 +1,107 @@
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from transform import app, metrics
+from transform.views import main
+from transform.views.test_views import test_message
+
+
+class HistogramTests(unittest.TestCase):
+
+    def test_expose(self):
+        registry = metrics.Registry()
+        histogram = registry.register(metrics.Histogram("test_seconds", "Test timings.", (0.1, 1), ("stage",)))
+        histogram.observe(0.05, "a")
+        histogram.observe(0.5, "a")
+        histogram.observe(5, 'b"\\\n')
+
+        self.assertEqual(
+            "# HELP test_seconds Test timings.\n"
+            "# TYPE test_seconds histogram\n"
+            'test_seconds_bucket{stage="a",le="0.1"} 1\n'
+            'test_seconds_bucket{stage="a",le="1"} 2\n'
+            'test_seconds_bucket{stage="a",le="+Inf"} 2\n'
+            'test_seconds_sum{stage="a"} 0.55\n'
+            'test_seconds_count{stage="a"} 2\n'
+            'test_seconds_bucket{stage="b\\"\\\\\\n",le="0.1"} 0\n'
+            'test_seconds_bucket{stage="b\\"\\\\\\n",le="1"} 0\n'
+            'test_seconds_bucket{stage="b\\"\\\\\\n",le="+Inf"} 1\n'
+            'test_seconds_sum{stage="b\\"\\\\\\n"} 5.0\n'
+            'test_seconds_count{stage="b\\"\\\\\\n"} 1\n',
+            registry.expose()
+        )
+
+    def test_bucket_bounds_inclusive(self):
+        histogram = metrics.Histogram("test", "Test.", (1, 2))
+        histogram.observe(1)
+        self.assertEqual([1, 1, 1], [value for suffix, _, _, _, value in histogram.samples() if suffix == "_bucket"])
+
+    def test_callback(self):
+        registry = metrics.Registry()
+        registry.register(metrics.Callback("test_total", "Test count.", "counter", lambda: 3))
+        self.assertEqual("# HELP test_total Test count.\n# TYPE test_total counter\ntest_total 3\n", registry.expose())
+
+
+class StageTimerTests(unittest.TestCase):
+
+    def test_stages(self):
+        timer = metrics.StageTimer()
+        with patch.object(metrics, "stage_seconds") as histogram:
+            with timer.stage("zip"):
+                pass
+            with timer.stage("zip"):
+                pass
+            with self.assertRaises(ValueError):
+                with timer.stage("render"):
+                    raise ValueError()
+
+        self.assertEqual(3, histogram.observe.call_count)
+        self.assertEqual("render", timer.failed)
+        self.assertEqual(["zip", "render"], list(timer.timings))
+        self.assertEqual(["zip_ms", "render_ms", "total_ms"], list(timer.log_fields()))
+
+    def test_stages_on_threads(self):
+        timer = metrics.StageTimer(record=False)
+
+        def time_stages(thread):
+            for i in range(200):
+                with timer.stage("stage_{0}_{1}".format(thread, i)):
+                    pass
+
+        threads = [threading.Thread(target=time_stages, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(8 * 200, len(timer.timings))
+
+
+class MetricsServiceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    @patch('transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list', return_value=[13, 14])
+    def test_cora_stages(self, mock_sequence_no):
+        logger = Mock()
+        with patch.object(main, "logger", logger):
+            r = self.app.post("/cora", data=test_message)
+        self.assertEqual(200, r.status_code)
+
+        args, fields = logger.info.call_args
+        self.assertEqual(("CORA:transform complete",), args)
+        self.assertEqual(2, fields["pages"])
+        self.assertEqual(len(r.data), fields["bytes"])
+        for stage in ("idbr", "tkn", "response_json", "render", "image_sequence", "index", "rasterise", "zip", "total"):
+            self.assertIn(stage + "_ms", fields)
+
+        r = self.app.get("/metrics")
+        self.assertEqual(200, r.status_code)
+        self.assertEqual(metrics.CONTENT_TYPE, r.headers["Content-Type"])
+        body = r.data.decode("utf-8")
+        self.assertIn('cora_stage_seconds_count{stage="rasterise"}', body)
+        self.assertIn("cora_pages_count", body)
+        self.assertIn("cora_survey_definitions 1", body)
@@ -1,8 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
 import unittest
 import json
+from unittest.mock import patch
+
+from reportlab import rl_config
+from reportlab.lib.styles import ParagraphStyle
+
 from transform.views.test_views import test_message
+from transform.transformers import pdf_transformer
 from transform.transformers.pdf_transformer import PDFTransformer
-from transform.transformers.pdf_transformer_style_cora import CoraPdfTransformerStyle
+from transform.transformers.pdf_transformer_style_cora import CoraPdfTransformerStyle, cora_pdf_style
 
 
 class TestPDFTransformer(unittest.TestCase):
@@ -30,3 +37,95 @@ class TestPDFTransformer(unittest.TestCase):
             actual_date = pdf_transformer._get_localised_date(response['submitted_at'], timezone='Europe/Moscow')
 
             self.assertEqual(expected_date, actual_date)
+
+
+class TestPDFSkeleton(unittest.TestCase):
+
+    def setUp(self):
+        with open("./transform/surveys/144.0001.json") as fp:
+            self.survey = json.load(fp)
+        self.responses = [json.loads(test_message)]
+        for reply in ("./tests/replies/ukis-01.json", "./tests/replies/ukis-02.json"):
+            with open(reply) as fp:
+                self.responses.append(json.load(fp))
+
+    @patch.object(rl_config, 'invariant', 1)
+    def test_cached_skeleton_renders_identically(self):
+        for response in self.responses:
+            with self.subTest(tx_id=response.get('tx_id')):
+                pdf_transformer._skeletons.clear()
+                cold = PDFTransformer(self.survey, response, CoraPdfTransformerStyle()).render_pages()
+                warm = PDFTransformer(self.survey, response, CoraPdfTransformerStyle()).render_pages()
+
+                self.assertEqual(cold, warm)
+
+    def test_skeleton_per_survey(self):
+        style = CoraPdfTransformerStyle()
+        skeleton = pdf_transformer._get_skeleton(self.survey, style)
+
+        self.assertIs(skeleton, pdf_transformer._get_skeleton(self.survey, CoraPdfTransformerStyle()))
+
+        # A different definition of the same survey replaces it
+        survey = json.loads(json.dumps(self.survey))
+        self.assertIsNot(skeleton, pdf_transformer._get_skeleton(survey, style))
+
+
+class TestSharedStyle(unittest.TestCase):
+
+    def test_style_is_read_only(self):
+        with self.assertRaises(AttributeError):
+            cora_pdf_style.style_n = None
+
+    def test_styles_are_read_only(self):
+        for name in ("style_n", "style_answer", "style_sh", "style_ssh", "style_h"):
+            style = getattr(cora_pdf_style, name)
+            with self.subTest(name=name):
+                with self.assertRaises(AttributeError):
+                    style.fontSize = 30
+                with self.assertRaises(AttributeError):
+                    del style.textColor
+
+    def test_clone_style(self):
+        style = cora_pdf_style.style_answer
+        size = style.fontSize
+
+        clone = style.clone("Bigger", fontSize=size * 2)
+        clone.leading = 30
+
+        self.assertIs(ParagraphStyle, type(clone))
+        self.assertEqual(("Bigger", size * 2, 30, style.spaceBefore, style),
+                         (clone.name, clone.fontSize, clone.leading, clone.spaceBefore, clone.parent))
+        self.assertEqual(size, style.fontSize)
+
+    @patch.object(rl_config, 'invariant', 1)
+    def test_renders_are_identical(self):
+        """Rendering doesn't change the shared style, so a second render matches the first"""
+        with open("./transform/surveys/144.0001.json") as fp:
+            survey = json.load(fp)
+        response = json.loads(test_message)
+
+        first = PDFTransformer(survey, response, cora_pdf_style).render()
+
+        self.assertEqual(first, PDFTransformer(survey, response, cora_pdf_style).render())
+        self.assertEqual(first, PDFTransformer(survey, response, CoraPdfTransformerStyle()).render())
+
+    @patch.object(rl_config, 'invariant', 1)
+    def test_concurrent_renders(self):
+        """Renders sharing the style from many threads match the same renders done one at a time"""
+        with open("./transform/surveys/144.0001.json") as fp:
+            survey = json.load(fp)
+        responses = [json.loads(test_message)]
+        for reply in ("./tests/replies/ukis-01.json", "./tests/replies/ukis-02.json"):
+            with open(reply) as fp:
+                responses.append(json.load(fp))
+        work = responses * 8
+
+        def render(response):
+            return PDFTransformer(survey, response, cora_pdf_style).render_pages()
+
+        expected = [render(response) for response in work]
+
+        with ThreadPoolExecutor(8) as executor:
+            actual = list(executor.map(render, work))
+
+        self.assertEqual(expected, actual)
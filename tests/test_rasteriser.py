@@ -0,0 +1,251 @@
+from contextlib import contextmanager
+import io
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+
+from transform import settings
+from transform.transformers.pdf_transformer import PDFTransformer
+from transform.transformers.pdf_transformer_style_cora import CoraPdfTransformerStyle
+from transform.transformers.rasteriser import (
+    RasterisationError, SubprocessRasteriser, jpeg_frames, page_ranges, pdf_file, pdftoppm
+)
+from transform.views.test_views import test_message
+
+
+class TestRasteriser(unittest.TestCase):
+
+    @staticmethod
+    def survey():
+        with open("./transform/surveys/144.0001.json") as fp:
+            return json.load(fp)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pdf, cls.page_count = PDFTransformer(cls.survey(), json.loads(test_message),
+                                                 CoraPdfTransformerStyle()).render_pages()
+
+    def test_page_workers_match_one_process(self):
+        expected = SubprocessRasteriser().rasterise(self.pdf)
+
+        for workers in (2, 3, self.page_count + 1):
+            with self.subTest(workers=workers):
+                self.assertEqual(expected, SubprocessRasteriser(workers).rasterise(self.pdf, self.page_count))
+
+        # Without a page count the pdf can't be split
+        self.assertEqual(expected, SubprocessRasteriser(4).rasterise(self.pdf))
+
+    def test_page_workers_report_pdftoppm_errors(self):
+        with self.assertRaises(IOError):
+            SubprocessRasteriser(2).rasterise(b"not a pdf", 2)
+
+
+class TestPdfFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertReadable(self, path):
+        with open(path, "rb") as fp:
+            self.assertEqual(b"%PDF-1.4 pretend", fp.read())
+
+    def test_memory_file(self):
+        with pdf_file(b"%PDF-1.4 pretend") as (path, fd):
+            self.assertReadable(path)
+
+        with self.assertRaises(OSError):
+            os.fstat(fd)
+
+    @unittest.skipUnless(os.path.isdir("/dev/shm"), "needs /dev/shm")
+    def test_shared_memory_without_memfd(self):
+        # As on Python 3.6, which has no memfd_create
+        memfd_create = os.__dict__.pop("memfd_create", None)
+        try:
+            with patch("tempfile.TemporaryFile", wraps=tempfile.TemporaryFile) as temporary_file:
+                with pdf_file(b"%PDF-1.4 pretend") as (path, fd):
+                    self.assertReadable(path)
+        finally:
+            if memfd_create is not None:
+                os.memfd_create = memfd_create
+
+        temporary_file.assert_called_once_with(dir="/dev/shm")
+
+    def test_scratch_directory(self):
+        with patch.object(settings, "RASTERISER_SCRATCH_DIR", self.directory):
+            with pdf_file(b"%PDF-1.4 pretend") as (path, fd):
+                self.assertReadable(path)
+                # The file has no name to be left behind
+                self.assertEqual([], os.listdir(self.directory))
+
+        with self.assertRaises(OSError):
+            os.fstat(fd)
+
+    def test_rasterise_from_scratch_directory(self):
+        pdf, page_count = PDFTransformer(TestRasteriser.survey(), json.loads(test_message),
+                                         CoraPdfTransformerStyle()).render_pages()
+        expected = SubprocessRasteriser().rasterise(pdf)
+
+        with patch.object(settings, "RASTERISER_SCRATCH_DIR", self.directory):
+            self.assertEqual(expected, SubprocessRasteriser().rasterise(pdf))
+            self.assertEqual(expected, SubprocessRasteriser(2).rasterise(pdf, page_count))
+
+    def test_closed_on_timeout(self):
+        before = set(os.listdir("/proc/self/fd"))
+
+        with fake_pdftoppm("exec sleep 30"):
+            with self.assertRaises(IOError):
+                pdftoppm(b"%PDF-1.4 pretend", timeout=0.5)
+
+        self.assertEqual(before, set(os.listdir("/proc/self/fd")))
+
+
+@contextmanager
+def fake_pdftoppm(script):
+    """Puts a shell script first on the path as pdftoppm"""
+    directory = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(directory, "pdftoppm"), "w") as fp:
+            fp.write("#!/bin/sh\n" + script + "\n")
+        os.chmod(os.path.join(directory, "pdftoppm"), 0o755)
+        with patch.dict(os.environ, {"PATH": directory + os.pathsep + os.environ["PATH"]}):
+            yield directory
+    finally:
+        shutil.rmtree(directory)
+
+
+def running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A zombie has finished, but hasn't been reaped by its parent
+    with open("/proc/{0}/stat".format(pid)) as fp:
+        return fp.read().split(")")[-1].split()[0] != "Z"
+
+
+class TestLimits(unittest.TestCase):
+
+    def test_timeout_kills_process_group(self):
+        # A pdftoppm which starts a child of its own, then hangs
+        with fake_pdftoppm('sleep 30 &\necho $! > "$(dirname "$0")/child"\nwait') as directory:
+            with self.assertRaises(RasterisationError) as raised:
+                pdftoppm(b"%PDF-1.4 pretend", timeout=0.5)
+            with open(os.path.join(directory, "child")) as fp:
+                child = int(fp.read())
+
+        self.assertEqual("timeout", raised.exception.reason)
+        self.assertGreaterEqual(raised.exception.seconds, 0.5)
+        for _ in range(50):
+            if not running(child):
+                break
+            time.sleep(0.1)
+        self.assertFalse(running(child))
+
+    @unittest.skipUnless(hasattr(resource, "prlimit"), "needs prlimit")
+    def test_cpu_limit(self):
+        with patch.object(settings, "RASTERISER_CPU_SECONDS", 1), fake_pdftoppm("while :; do :; done"):
+            with self.assertRaises(RasterisationError) as raised:
+                pdftoppm(b"%PDF-1.4 pretend", timeout=30)
+
+        self.assertEqual("cpu_limit", raised.exception.reason)
+        self.assertLess(raised.exception.seconds, 10)
+
+    @unittest.skipUnless(hasattr(resource, "prlimit"), "needs prlimit")
+    def test_memory_limit(self):
+        with patch.object(settings, "RASTERISER_MEMORY_BYTES", 256 * 1024 ** 2), \
+                fake_pdftoppm('exec "{0}" -c "bytearray(1024 ** 3)"'.format(sys.executable)):
+            with self.assertRaises(RasterisationError) as raised:
+                pdftoppm(b"%PDF-1.4 pretend", timeout=30)
+
+        self.assertEqual("memory_limit", raised.exception.reason)
+        self.assertIn("MemoryError", raised.exception.diagnostics()["stderr"])
+
+    def test_failed_range_stops_the_others(self):
+        # The first range fails at once, the second would take 30s
+        script = 'case "$*" in *"-f 1 "*) echo "bad page" >&2; exit 1;; *) exec sleep 30;; esac'
+        with fake_pdftoppm(script):
+            started = time.perf_counter()
+            with self.assertRaises(RasterisationError) as raised:
+                SubprocessRasteriser(2, timeout=30).rasterise(b"%PDF-1.4 pretend", 4)
+
+        self.assertEqual("error", raised.exception.reason)
+        self.assertEqual("1-2", raised.exception.pages)
+        self.assertLess(time.perf_counter() - started, 10)
+
+
+class TestPageRanges(unittest.TestCase):
+
+    def test_ranges_cover_pages_in_order(self):
+        for page_count in range(1, 30):
+            for jobs in range(1, 10):
+                with self.subTest(page_count=page_count, jobs=jobs):
+                    ranges = page_ranges(page_count, jobs)
+                    if page_count == 1 or jobs == 1:
+                        self.assertEqual([(None, None)], ranges)
+                        continue
+                    self.assertEqual(min(jobs, page_count), len(ranges))
+                    pages = [page for first, last in ranges for page in range(first, last + 1)]
+                    self.assertEqual(list(range(1, page_count + 1)), pages)
+                    sizes = [last - first + 1 for first, last in ranges]
+                    self.assertLessEqual(max(sizes) - min(sizes), 1)
+
+    def test_without_page_count(self):
+        self.assertEqual([(None, None)], page_ranges(None, 4))
+        self.assertEqual([(None, None)], page_ranges(-1, 4))
+
+
+class TestJpegFrames(unittest.TestCase):
+
+    @staticmethod
+    def make_jpeg(colour, **kwargs):
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 48), colour).save(buffer, "JPEG", **kwargs)
+        return buffer.getvalue()
+
+    @staticmethod
+    def with_app_segment(jpeg, payload):
+        """Insert an APP1 segment, as a thumbnail would be, after the SOI marker"""
+        segment = b"\xFF\xE1" + (len(payload) + 2).to_bytes(2, "big") + payload
+        return jpeg[:2] + segment + jpeg[2:]
+
+    def test_frames_are_complete_jpegs(self):
+        jpegs = [self.make_jpeg("red"), self.make_jpeg("white", progressive=True), self.make_jpeg("blue")]
+
+        frames = list(jpeg_frames(b"".join(jpegs)))
+
+        self.assertEqual(jpegs, [bytes(frame) for frame in frames])
+        for frame in frames:
+            self.assertIsInstance(frame, memoryview)
+            self.assertEqual(b"\xFF\xD9", bytes(frame[-2:]))
+            Image.open(io.BytesIO(frame)).load()
+
+    def test_end_of_image_inside_segment(self):
+        jpegs = [self.with_app_segment(self.make_jpeg("red"), b"thumb\xFF\xD9nail"), self.make_jpeg("blue")]
+
+        frames = [bytes(frame) for frame in jpeg_frames(b"".join(jpegs))]
+
+        self.assertEqual(jpegs, frames)
+
+    def test_trailing_data_ignored(self):
+        jpeg = self.make_jpeg("red")
+
+        self.assertEqual([jpeg], [bytes(frame) for frame in jpeg_frames(jpeg + b"\n")])
+
+    def test_truncated_jpeg(self):
+        jpeg = self.make_jpeg("red")
+
+        with self.assertRaises(RasterisationError) as raised:
+            list(jpeg_frames(jpeg + jpeg[:len(jpeg) // 2]))
+
+        self.assertEqual("corrupt_output", raised.exception.reason)
@@ -0,0 +1,121 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import zipfile
+from unittest.mock import patch
+
+from transform import app, settings
+from transform.result_cache import ResultCache, result_key
+from transform.views import main
+from transform.views.test_views import test_message
+
+
+class TestResultKey(unittest.TestCase):
+
+    def test_key(self):
+        response = json.loads(test_message)
+        key = result_key(response, 1000, "v1")
+
+        reordered = json.loads(json.dumps(response, sort_keys=True))
+        self.assertEqual(key, result_key(reordered, 1000, "v1"))
+        self.assertNotEqual(key, result_key(response, 1001, "v1"))
+        self.assertNotEqual(key, result_key(response, 1000, "v2"))
+
+        response["data"]["0210"] = "Yes"
+        self.assertNotEqual(key, result_key(response, 1000, "v1"))
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_least_recently_used_evicted(self):
+        cache = ResultCache(10)
+        cache.put("a", b"aaaa")
+        cache.put("b", b"bbbb")
+        self.assertEqual(b"aaaa", cache.get("a"))
+
+        cache.put("c", b"cccc")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(b"aaaa", cache.get("a"))
+        self.assertEqual(b"cccc", cache.get("c"))
+        self.assertEqual({"hits": 3, "misses": 1, "evictions": 1, "bytes": 8, "entries": 2}, cache.stats())
+
+    def test_result_larger_than_budget_not_kept(self):
+        cache = ResultCache(3)
+        cache.put("a", b"aaaa")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(0, cache.bytes)
+
+    def test_disk(self):
+        cache = ResultCache(4, self.directory, 1024)
+        cache.put("a", b"aaaa")
+        cache.put("b", b"bbbb")
+
+        # Evicted from memory but read back from disk, by this cache or another
+        self.assertEqual(b"aaaa", cache.get("a"))
+        self.assertEqual(b"bbbb", ResultCache(0, self.directory, 1024).get("b"))
+        self.assertEqual(8, cache.disk_bytes())
+
+    def test_disk_budget(self):
+        cache = ResultCache(0, self.directory, 10)
+        cache.put("a", b"aaaa")
+        os.utime(os.path.join(self.directory, "a.zip"), (time.time() - 60, time.time() - 60))
+        cache.put("b", b"bbbb")
+        cache.put("c", b"cccc")
+
+        self.assertEqual(["b.zip", "c.zip"], sorted(os.listdir(self.directory)))
+        self.assertEqual(1, cache.evictions)
+
+    def test_caching_stream(self):
+        cache = ResultCache(100)
+        self.assertEqual([b"ab", b"cd"], list(cache.caching("a", iter([b"ab", b"cd"]))))
+        self.assertEqual(b"abcd", cache.get("a"))
+
+
+class TestCachedCoraService(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        self.cache = ResultCache(10 * 1024 * 1024)
+
+    def post(self, endpoint="/cora/2345"):
+        with patch.object(main, "get_result_cache", return_value=self.cache):
+            r = self.app.post(endpoint, data=test_message)
+        self.assertEqual(200, r.status_code)
+        return r.data
+
+    @patch('transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list', return_value=[13, 14])
+    def test_repeat_returns_same_zip(self, mock_sequence_no):
+        first = self.post()
+        with patch('transform.transformers.image_transformer.ImageTransformer._create_pdf') as mock_pdf:
+            second = self.post()
+
+        self.assertEqual(first, second)
+        mock_sequence_no.assert_called_once()
+        mock_pdf.assert_not_called()
+        self.assertEqual(1, self.cache.hits)
+
+        # A different sequence number is a different result
+        self.post("/cora/2346")
+        self.assertEqual(2, mock_sequence_no.call_count)
+
+    @patch('transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list', return_value=[13, 14])
+    def test_streamed_zip_cached(self, mock_sequence_no):
+        with patch.object(settings, 'CORA_STREAM_RESPONSE', True):
+            first = self.post()
+        second = self.post()
+
+        self.assertEqual(first, second)
+        self.assertIsNone(zipfile.ZipFile(io.BytesIO(second)).testzip())
+        mock_sequence_no.assert_called_once()
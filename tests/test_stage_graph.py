@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import unittest
+
+from transform.stage_graph import StageGraph
+
+
+class TestStageGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(4)
+        self.graph = StageGraph(self.executor)
+        self.ran = []
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def stage(self, name, result=None):
+        def function():
+            self.ran.append((name, threading.current_thread()))
+            return result
+        return function
+
+    def names(self):
+        return [name for name, _ in self.ran]
+
+    def test_results_by_name(self):
+        self.graph.add("a", self.stage("a", 1))
+        self.graph.add("b", self.stage("b", 2), requires=["a"], blocking=True)
+
+        self.assertEqual({"a": 1, "b": 2}, self.graph.run())
+
+    def test_requirements_run_first(self):
+        self.graph.add("render", self.stage("render"))
+        self.graph.add("rasterise", self.stage("rasterise"), requires=["render"], blocking=True)
+        self.graph.add("index", self.stage("index"), requires=["rasterise"])
+        self.graph.add("tkn", self.stage("tkn"))
+
+        self.graph.run()
+
+        self.assertLess(self.names().index("render"), self.names().index("rasterise"))
+        self.assertLess(self.names().index("rasterise"), self.names().index("index"))
+
+    def test_blocking_stages_overlap(self):
+        # Each waits for the other, so only finishes if both run at once
+        barrier = threading.Barrier(2, timeout=5)
+        self.graph.add("sequence", barrier.wait, blocking=True)
+        self.graph.add("rasterise", barrier.wait, blocking=True)
+
+        self.graph.run()
+
+    def test_other_stages_run_on_calling_thread_in_order_added(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking():
+            started.set()
+            self.assertTrue(release.wait(5))
+
+        def tkn():
+            # Runs while the blocking stage is still waiting
+            self.assertTrue(started.wait(5))
+            self.ran.append(("tkn", threading.current_thread()))
+            release.set()
+
+        self.graph.add("render", self.stage("render"))
+        self.graph.add("rasterise", blocking, requires=["render"], blocking=True)
+        self.graph.add("tkn", tkn)
+        self.graph.add("idbr", self.stage("idbr"))
+
+        self.graph.run()
+
+        self.assertEqual(["render", "tkn", "idbr"], self.names())
+        for _, thread in self.ran:
+            self.assertIs(threading.current_thread(), thread)
+
+    def test_failure_stops_later_stages(self):
+        def fail():
+            raise IOError("pdftoppm failed")
+
+        self.graph.add("render", self.stage("render"))
+        self.graph.add("rasterise", fail, requires=["render"], blocking=True)
+        self.graph.add("index", self.stage("index"), requires=["rasterise"])
+
+        with self.assertRaises(IOError):
+            self.graph.run()
+        self.assertEqual(["render"], self.names())
+
+    def test_waits_for_running_stages_after_failure(self):
+        finished = threading.Event()
+
+        def slow():
+            self.assertFalse(finished.wait(0.1))
+            finished.set()
+
+        def fail():
+            raise ValueError()
+
+        self.graph.add("sequence", slow, blocking=True)
+        self.graph.add("tkn", fail)
+
+        with self.assertRaises(ValueError):
+            self.graph.run()
+        self.assertTrue(finished.is_set())
+
+    def test_unknown_requirement(self):
+        with self.assertRaises(ValueError):
+            self.graph.add("index", self.stage("index"), requires=["image_sequence"])
+
+    def test_duplicate_stage(self):
+        self.graph.add("render", self.stage("render"))
+        with self.assertRaises(ValueError):
+            self.graph.add("render", self.stage("render"))
@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from transform.survey_registry import SurveyRegistry, SURVEYS_DIR
+
+
+class TestSurveyRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        shutil.copy(os.path.join(SURVEYS_DIR, "144.0001.json"), self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_survey(self, filename, survey):
+        with open(os.path.join(self.directory, filename), "w") as fp:
+            json.dump(survey, fp)
+
+    def test_get_survey(self):
+        registry = SurveyRegistry(SURVEYS_DIR)
+
+        survey = registry.get("144", "0001")
+
+        self.assertEqual("UKIS", survey["title"])
+        self.assertIs(survey, registry.get("144", "0001"))
+        self.assertIsNone(registry.get("144", "0002"))
+        self.assertIsNone(registry.get("666", "0001"))
+        self.assertEqual({"surveys": 1, "hits": 2, "misses": 2}, registry.stats())
+
+    def test_survey_is_read_only(self):
+        survey = SurveyRegistry(SURVEYS_DIR).get("144", "0001")
+
+        with self.assertRaises(TypeError):
+            survey["title"] = "Changed"
+        with self.assertRaises(TypeError):
+            survey["question_groups"][0]["questions"][0]["text"] = "Changed"
+        with self.assertRaises(AttributeError):
+            survey["question_groups"].append({})
+
+    def test_invalid_survey(self):
+        self.write_survey("145.0001.json", {"title": "No questions", "survey_id": "145", "form_type": "0001"})
+
+        with self.assertRaises(ValueError):
+            SurveyRegistry(self.directory)
+
+    def test_mismatched_survey_id(self):
+        self.write_survey("145.0001.json", {
+            "title": "Wrong id", "survey_id": "146", "form_type": "0001", "question_groups": []
+        })
+
+        with self.assertRaises(ValueError):
+            SurveyRegistry(self.directory)
+
+    def test_reload(self):
+        registry = SurveyRegistry(self.directory, reload=True)
+        self.assertIsNone(registry.get("145", "0001"))
+
+        self.write_survey("145.0001.json", {
+            "title": "New survey", "survey_id": "145", "form_type": "0001", "question_groups": []
+        })
+
+        self.assertEqual("New survey", registry.get("145", "0001")["title"])
+
+    def test_failed_reload_keeps_surveys(self):
+        registry = SurveyRegistry(self.directory, reload=True)
+
+        self.write_survey("145.0001.json", {"title": "Invalid"})
+
+        self.assertEqual("UKIS", registry.get("144", "0001")["title"])
+        self.assertIsNone(registry.get("145", "0001"))
+
+    def test_version_changes_with_definition(self):
+        registry = SurveyRegistry(self.directory)
+        version = registry.version("144", "0001")
+        self.assertEqual(64, len(version))
+        self.assertIsNone(registry.version("145", "0001"))
+
+        with open(os.path.join(self.directory, "144.0001.json")) as fp:
+            survey = json.load(fp)
+        survey["title"] = "Changed"
+        self.write_survey("144.0001.json", survey)
+        registry.load()
+
+        self.assertNotEqual(version, registry.version("144", "0001"))
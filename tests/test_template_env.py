@@ -0,0 +1,45 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from transform.transformers import formatters
+from transform.views import image_filters, main, test_views
+from transform.views.test_views import test_message
+
+
+class TestTemplateEnv(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shared(self):
+        for module in (formatters, main, test_views):
+            with self.subTest(module=module.__name__):
+                self.assertIs(image_filters.env, module.env)
+        self.assertIs(image_filters.env, image_filters.get_env())
+
+    def test_configured(self):
+        env = image_filters.env
+        self.assertFalse(env.auto_reload)
+        self.assertIn('format_date', env.filters)
+        self.assertIn('trim_final_newline', env.filters)
+
+    def test_precompiled(self):
+        self.assertEqual(
+            sorted(image_filters.env.list_templates()),
+            sorted(name for _, name in image_filters.env.cache)
+        )
+
+    def test_bytecode_cache(self):
+        env = image_filters.create_env(bytecode_cache_dir=self.directory)
+        source = env.get_template('idbr.tmpl').render(response=json.loads(test_message))
+        self.assertEqual(1, len(os.listdir(self.directory)))
+
+        # Loaded by another environment, as by a new worker, from the cache
+        env = image_filters.create_env(bytecode_cache_dir=self.directory)
+        self.assertEqual(source, env.get_template('idbr.tmpl').render(response=json.loads(test_message)))
@@ -0,0 +1,78 @@
+import json
+import unittest
+from unittest.mock import Mock, patch
+
+import gunicorn_config
+from transform import app, metrics, settings, warmup
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def tearDown(self):
+        warmup.state = None
+
+    @patch('transform.transformers.image_transformer.ImageTransformer._get_image_sequence_list')
+    def test_warm_up(self, mock_sequence_list):
+        stages = list(metrics.stage_seconds.samples())
+
+        warmup.warm_up()
+
+        self.assertEqual("warm", warmup.state)
+        # Neither sdx-sequence nor the metrics see it
+        mock_sequence_list.assert_not_called()
+        self.assertEqual(stages, list(metrics.stage_seconds.samples()))
+        self.assertEqual(200, self.app.get("/healthcheck").status_code)
+
+    @patch('transform.transformers.cora_transformer.CORATransformer.get_entries', side_effect=IOError())
+    def test_failed_warm_up(self, mock_entries):
+        with self.assertRaises(IOError):
+            warmup.warm_up()
+
+        self.assertEqual("failed", warmup.state)
+        r = self.app.get("/healthcheck")
+        self.assertEqual(503, r.status_code)
+        self.assertEqual("FAILED", json.loads(r.data.decode("utf-8"))["status"])
+
+    @patch('transform.warmup.time.sleep')
+    def test_background_warm_up_retries(self, mock_sleep):
+        outcomes = [IOError(), IOError(), None]
+
+        def warm_up():
+            outcome = outcomes.pop(0)
+            if outcome is not None:
+                warmup.state = "failed"
+                raise outcome
+            warmup.state = "warm"
+
+        with patch('transform.warmup.warm_up', side_effect=warm_up) as mock_warm_up:
+            warmup._warm_up_until_warm(5, 5)
+
+        self.assertEqual(3, mock_warm_up.call_count)
+        self.assertEqual([((5,),), ((10,),)], mock_sleep.call_args_list)
+        self.assertEqual("warm", warmup.state)
+
+    @patch('transform.warmup.time.sleep')
+    def test_background_warm_up_gives_up(self, mock_sleep):
+        with patch('transform.warmup.warm_up', side_effect=IOError()) as mock_warm_up:
+            warmup._warm_up_until_warm(5, 3)
+
+        self.assertEqual(3, mock_warm_up.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
+        self.assertEqual("failed", warmup.state)
+        self.assertEqual(503, self.app.get("/healthcheck").status_code)
+
+    def test_worker_exits_if_warm_up_fails(self):
+        worker = Mock(forked_at=0)
+
+        with patch.object(settings, 'WARM_UP', True), patch('transform.warmup.warm_up', side_effect=IOError()):
+            with self.assertRaises(SystemExit):
+                gunicorn_config.post_worker_init(worker)
+
+    def test_healthcheck_while_warming(self):
+        self.assertEqual(200, self.app.get("/healthcheck").status_code)
+        warmup.state = "warming"
+        self.assertEqual(503, self.app.get("/healthcheck").status_code)
@@ -0,0 +1,61 @@
+from datetime import datetime
+from functools import lru_cache
+
+import dateutil.parser
+from dateutil import tz
+
+UK = "Europe/London"
+
+# English names, whatever the locale
+MONTHS = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+
+
+def _short(d):
+    return "{0:04d}{1:02d}{2:02d}".format(d.year, d.month, d.day)
+
+
+def _long(d):
+    return "{0:02d}/{1:02d}/{2:04d} {3:02d}:{4:02d}:{5:02d}".format(d.day, d.month, d.year, d.hour, d.minute, d.second)
+
+
+def _written(d):
+    return "{0:02d} {1} {2:04d} {3:02d}:{4:02d}:{5:02d}".format(d.day, MONTHS[d.month - 1], d.year, d.hour, d.minute, d.second)
+
+
+# Formats by style: short is YYYYMMDD, long DD/MM/YYYY HH:mm:ss and written DD MMMM YYYY HH:mm:ss
+_STYLES = {
+    "short": _short,
+    "long": _long,
+    "written": _written,
+}
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    timezone = tz.gettz(name)
+    if timezone is None:
+        raise ValueError("Unknown timezone {0}".format(name))
+    return timezone
+
+
+@lru_cache(maxsize=256)
+def localise(value, timezone=UK):
+    """Converts a datetime, or an ISO 8601 string, to a timezone. Those
+    without a timezone of their own are taken to be in UTC, as arrow takes them."""
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    if not isinstance(value, datetime):
+        raise TypeError("Can't convert {0!r} to a date".format(value))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz.tzutc())
+    return value.astimezone(get_timezone(timezone))
+
+
+@lru_cache(maxsize=1024)
+def format_date(value, style="long", timezone=UK):
+    """Formats a datetime, or an ISO 8601 string, in a timezone. Styles other
+    than short and written are long."""
+    return _STYLES.get(style, _long)(localise(value, timezone))
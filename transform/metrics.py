@@ -0,0 +1,158 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import time
+
+# The exposition format version /metrics serves
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(name, _escape(value)) for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Counts observations into cumulative buckets, for each set of label values"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = OrderedDict()
+
+    def observe(self, value, *labelvalues):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = [(labelvalues, list(counts), total, count)
+                      for labelvalues, (counts, total, count) in self._series.items()]
+
+        for labelvalues, counts, total, count in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield "_bucket", self.labelnames, labelvalues, (("le", _number(bound)),), cumulative
+            yield "_sum", self.labelnames, labelvalues, (), total
+            yield "_count", self.labelnames, labelvalues, (), count
+
+
+class Callback:
+    """A gauge or counter whose value is read from a function when exposed"""
+
+    def __init__(self, name, documentation, type, function):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self._function = function
+
+    def samples(self):
+        yield "", (), (), (), self._function()
+
+
+class Registry:
+    """The metrics exposed on /metrics"""
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def expose(self):
+        """Returns every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append("# HELP {0} {1}".format(metric.name, metric.documentation))
+            lines.append("# TYPE {0} {1}".format(metric.name, metric.type))
+            for suffix, names, values, extra, value in metric.samples():
+                lines.append("{0}{1}{2} {3}".format(metric.name, suffix, _labels(names, values, extra), _number(value)))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "cora_stage_seconds", "Time taken by each stage of a transform.",
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ("stage",),
+))
+
+pages = registry.register(Histogram(
+    "cora_pages", "Pages rendered for each transform.",
+    (1, 2, 3, 4, 5, 6, 8, 10, 15, 20),
+))
+
+output_bytes = registry.register(Histogram(
+    "cora_output_bytes", "Size of each transform's zip.",
+    tuple(4 ** i for i in range(7, 14)),
+))
+
+
+class StageTimer:
+    """Times the stages of one transform, for its log line and, if record is
+    set, the stage histogram. A stage entered more than once, such as adding
+    each file to the zip, is recorded once per entry and logged as the total."""
+
+    def __init__(self, record=True):
+        self.timings = OrderedDict()
+        # The first stage to raise an exception
+        self.failed = None
+        self._record = record
+        self._start = time.perf_counter()
+        # Stages of a pipelined transform finish on different threads
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                if self.failed is None:
+                    self.failed = name
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            if self._record:
+                stage_seconds.observe(elapsed, name)
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def log_fields(self):
+        """Timings in milliseconds, for a log line"""
+        with self._lock:
+            timings = list(self.timings.items())
+        fields = OrderedDict(("{0}_ms".format(name), round(seconds * 1000, 1)) for name, seconds in timings)
+        fields["total_ms"] = round(self.elapsed() * 1000, 1)
+        return fields
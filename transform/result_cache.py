@@ -0,0 +1,193 @@
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from structlog import wrap_logger
+
+from transform import __version__, settings
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+
+def result_key(response, sequence_no, survey_version, image_profile=None):
+    """Returns a hash identifying the zip a transform of the response produces"""
+    content = json.dumps(
+        [__version__, survey_version, sequence_no, response, image_profile],
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Finished zips kept by key, so a response which is sent again can be
+    answered with the same bytes without transforming it again.
+
+    The most recently used zips are kept in memory, up to max_bytes. With a
+    directory, zips are also written to disk, up to max_disk_bytes, and zips
+    dropped from memory can be read back from there, including by other
+    workers and after a restart.
+    """
+
+    def __init__(self, max_bytes, directory=None, max_disk_bytes=0):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        """Returns the zip for a key, or None if it isn't cached"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+        result = self._read(key)
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._keep(key, result)
+
+        return result
+
+    def put(self, key, result):
+        """Caches the zip for a key"""
+        result = bytes(result)
+        with self._lock:
+            self._keep(key, result)
+        self._write(key, result)
+
+    def caching(self, key, chunks):
+        """Passes on the chunks of a zip as it is streamed, caching it once it is complete"""
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.put(key, b"".join(parts))
+
+    def disk_bytes(self):
+        if not self.directory:
+            return 0
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.bytes,
+            "entries": len(self._entries),
+        }
+
+    def _keep(self, key, result):
+        if len(result) > self.max_bytes:
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= len(previous)
+
+        self._entries[key] = result
+        self.bytes += len(result)
+
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".zip")
+
+    def _read(self, key):
+        if not self.directory:
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fp:
+                result = fp.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            # Used most recently, so removed from disk last
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return result
+
+    def _write(self, key, result):
+        if not self.directory or len(result) > self.max_disk_bytes:
+            return
+
+        # Written to one side and renamed, so a reader never sees part of a zip
+        path = self._path(key)
+        temp_path = "{0}.{1}.{2}.tmp".format(path, os.getpid(), threading.get_ident())
+        try:
+            with open(temp_path, "wb") as fp:
+                fp.write(result)
+            os.replace(temp_path, path)
+        except OSError:
+            logger.exception("Could not write cached result", path=path)
+            return
+
+        self._trim_disk()
+
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".zip"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _trim_disk(self):
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, name in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Returns the worker's result cache, or None if results aren't cached"""
+    global _cache
+    if settings.CORA_CACHE_BYTES <= 0 and not settings.CORA_CACHE_DIR:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(settings.CORA_CACHE_BYTES, settings.CORA_CACHE_DIR, settings.CORA_CACHE_DISK_BYTES)
+            logger.info("Caching results", max_bytes=settings.CORA_CACHE_BYTES, directory=settings.CORA_CACHE_DIR)
+        return _cache
@@ -27,3 +27,59 @@ SDX_SEQUENCE_URL = _get_value("SDX_SEQUENCE_URL", "http://sdx-sequence:5000")
 FTP_PATH = _get_value("FTP_PATH", "\\")
 
 SDX_RESPONSE_JSON_PATH = "EDC_QJson"
+
+RASTERISER_JOB_TIMEOUT = int(_get_value("RASTERISER_JOB_TIMEOUT", "60"))
+# CPU seconds and bytes of memory pdftoppm may use, 0 for no limit
+RASTERISER_CPU_SECONDS = int(_get_value("RASTERISER_CPU_SECONDS", "60"))
+RASTERISER_MEMORY_BYTES = int(_get_value("RASTERISER_MEMORY_BYTES", str(1024 ** 3)))
+# Rasterise ranges of a pdf's pages with up to this many pdftoppm processes at once, 1 for one per pdf
+RASTERISER_PAGE_WORKERS = int(_get_value("RASTERISER_PAGE_WORKERS", "1"))
+# Directory pdfs are written to for pdftoppm to read, by default in memory where the system allows
+RASTERISER_SCRATCH_DIR = os.getenv("RASTERISER_SCRATCH_DIR")
+
+# Page images for surveys without an image_profile of their own: resolution, jpeg quality, greyscale,
+# and progressive jpegs with optimised Huffman tables
+IMAGE_DPI = int(_get_value("IMAGE_DPI", "150"))
+IMAGE_QUALITY = int(_get_value("IMAGE_QUALITY", "75"))
+IMAGE_GREY = _get_value("IMAGE_GREY", "false").lower() == "true"
+IMAGE_PROGRESSIVE = _get_value("IMAGE_PROGRESSIVE", "false").lower() == "true"
+IMAGE_OPTIMISE = _get_value("IMAGE_OPTIMISE", "false").lower() == "true"
+
+# Send /cora zips as they are written instead of building them in memory first
+CORA_STREAM_RESPONSE = _get_value("CORA_STREAM_RESPONSE", "false").lower() == "true"
+
+# What to do with coded CORA fields which don't match their formats: strict rejects
+# the submission, warn logs the fields and off skips the checks
+CORA_VALIDATION = _get_value("CORA_VALIDATION", "warn").lower()
+if CORA_VALIDATION not in ("strict", "warn", "off"):
+    logger.error("CORA_VALIDATION must be strict, warn or off", value=CORA_VALIDATION)
+    raise ValueError()
+
+# Cache finished /cora zips, so a response sent again gets the same zip without being transformed again.
+# Bytes kept in memory, 0 for none, and optionally a directory and the bytes kept there
+CORA_CACHE_BYTES = int(_get_value("CORA_CACHE_BYTES", "0"))
+CORA_CACHE_DIR = os.getenv("CORA_CACHE_DIR")
+CORA_CACHE_DISK_BYTES = int(_get_value("CORA_CACHE_DISK_BYTES", str(1024 ** 3)))
+
+# Reload survey definitions when their files change, for development
+SURVEY_RELOAD = _get_value("SURVEY_RELOAD", "false").lower() == "true"
+
+# Reserve image sequence numbers from sdx-sequence in blocks of this size, 0 to request them per submission
+IMAGE_SEQUENCE_BLOCK_SIZE = int(_get_value("IMAGE_SEQUENCE_BLOCK_SIZE", "0"))
+# Directory in which reserved but unused image sequence numbers are kept across restarts
+IMAGE_SEQUENCE_STATE_DIR = os.getenv("IMAGE_SEQUENCE_STATE_DIR")
+
+# Render idbr receipts and index files from their templates instead of formatting them directly
+RENDER_WITH_TEMPLATES = _get_value("RENDER_WITH_TEMPLATES", "false").lower() == "true"
+
+# Check templates for changes each time they are used, for development
+TEMPLATE_AUTO_RELOAD = _get_value("TEMPLATE_AUTO_RELOAD", "false").lower() == "true"
+# Directory compiled templates are cached in, by default one in the system's temporary directory
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")
+
+# Transform a synthetic submission when each worker starts, before it accepts requests
+WARM_UP = _get_value("WARM_UP", "true").lower() == "true"
+
+# Run the stages of a /cora transform that don't depend on each other at the same time
+CORA_PIPELINE = _get_value("CORA_PIPELINE", "false").lower() == "true"
+CORA_PIPELINE_THREADS = int(_get_value("CORA_PIPELINE_THREADS", "4"))
@@ -0,0 +1,81 @@
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import logging
+import threading
+
+from structlog import wrap_logger
+
+from transform import settings
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+Stage = namedtuple("Stage", "name function requires blocking")
+
+
+class StageGraph:
+    """The stages of a transform, each with the stages it needs finished first,
+    run so that stages with nothing between them overlap.
+
+    Blocking stages, which wait on sdx-sequence or pdftoppm, are run on the
+    executor's threads. The rest hold the GIL, so running two at once would
+    gain nothing: they are run one at a time on the calling thread, in the
+    order they were added, while blocking stages wait.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._stages = OrderedDict()
+
+    def add(self, name, function, requires=(), blocking=False):
+        """Adds a stage calling function once every stage in requires has
+        finished. Stages can only require ones already added."""
+        if name in self._stages:
+            raise ValueError("Stage {0} already added".format(name))
+        unknown = [required for required in requires if required not in self._stages]
+        if unknown:
+            raise ValueError("Stage {0} requires unknown stages {1}".format(name, ", ".join(unknown)))
+        self._stages[name] = Stage(name, function, tuple(requires), blocking)
+
+    def run(self):
+        """Runs every stage, returning their results by name. Once a stage
+        raises no more are started, and its exception is raised when those
+        already running have finished."""
+        results = {}
+        pending = OrderedDict(self._stages)
+        running = {}
+        try:
+            while pending or running:
+                for future in [future for future in running if future.done()]:
+                    results[running.pop(future)] = future.result()
+
+                ready = [stage for stage in pending.values() if all(name in results for name in stage.requires)]
+                for stage in ready:
+                    if stage.blocking:
+                        del pending[stage.name]
+                        running[self.executor.submit(stage.function)] = stage.name
+
+                stage = next((stage for stage in ready if not stage.blocking), None)
+                if stage is not None:
+                    del pending[stage.name]
+                    results[stage.name] = stage.function()
+                elif running:
+                    wait(running, return_when=FIRST_COMPLETED)
+        finally:
+            wait(running)
+
+        return results
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_stage_executor():
+    """Returns the worker's thread pool for blocking stages, starting it if it
+    isn't running yet"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(settings.CORA_PIPELINE_THREADS)
+            logger.info("Started stage executor", threads=settings.CORA_PIPELINE_THREADS)
+        return _executor
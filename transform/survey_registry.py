@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from types import MappingProxyType
+
+from structlog import wrap_logger
+from voluptuous import ALLOW_EXTRA, All, Invalid, Range, Required, Schema
+
+from transform import settings
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+SURVEYS_DIR = os.path.join(os.path.dirname(__file__), "surveys")
+
+survey_schema = Schema({
+    Required("title"): str,
+    Required("survey_id"): str,
+    Required("form_type"): str,
+    Required("question_groups"): [{
+        "title": str,
+        "meta": str,
+        Required("questions"): [{
+            Required("question_id"): str,
+            "text": str,
+            "number": str,
+        }],
+    }],
+    # Replaces the settings' image profile for the survey's page images. Unlike the
+    # rest of the definition, unknown keys aren't allowed
+    "image_profile": Schema({
+        "dpi": All(int, Range(min=50, max=600)),
+        "quality": All(int, Range(min=1, max=100)),
+        "grey": bool,
+        "progressive": bool,
+        "optimise": bool,
+    }),
+}, extra=ALLOW_EXTRA)
+
+
+def _freeze(value):
+    """Returns a read-only copy of a parsed json value"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class SurveyRegistry:
+    """Survey definitions, loaded and validated once and indexed by
+    (survey_id, instrument_id).
+
+    Definitions are returned as read-only views, so one copy can be shared by
+    every request. With reload set, files are loaded again whenever one is
+    added, removed or modified.
+    """
+
+    def __init__(self, directory=SURVEYS_DIR, reload=False):
+        self.directory = directory
+        self.reload = reload
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._surveys = {}
+        self._versions = {}
+        self._mtimes = {}
+        self.load()
+
+    def load(self):
+        """Loads and validates every definition, raising ValueError if one is invalid"""
+        mtimes = self._get_mtimes()
+        surveys = {}
+        versions = {}
+
+        for path in sorted(mtimes):
+            survey_id, _, instrument_id = os.path.basename(path)[:-len(".json")].partition(".")
+
+            try:
+                with open(path, "rb") as fp:
+                    contents = fp.read()
+                survey = survey_schema(json.loads(contents.decode("utf-8")))
+            except (ValueError, Invalid) as e:
+                raise ValueError("Invalid survey definition {0}: {1}".format(path, e))
+
+            if survey["survey_id"] != survey_id:
+                raise ValueError("Survey definition {0} has survey_id {1}".format(path, survey["survey_id"]))
+
+            surveys[(survey_id, instrument_id)] = _freeze(survey)
+            versions[(survey_id, instrument_id)] = hashlib.sha256(contents).hexdigest()
+
+        self._surveys, self._versions, self._mtimes = surveys, versions, mtimes
+        logger.info("Loaded survey definitions", surveys=[".".join(key) for key in sorted(surveys)])
+
+    def get(self, survey_id, instrument_id):
+        """Returns the definition for a survey and instrument, or None if there isn't one"""
+        if self.reload:
+            self._reload_if_changed()
+
+        survey = self._surveys.get((survey_id, instrument_id))
+
+        with self._lock:
+            if survey is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if survey is None:
+            logger.warning("No survey definition", survey_id=survey_id, instrument_id=instrument_id)
+
+        return survey
+
+    def version(self, survey_id, instrument_id):
+        """Returns a hash of the definition's file, which changes whenever the definition does"""
+        return self._versions.get((survey_id, instrument_id))
+
+    def stats(self):
+        return {
+            "surveys": len(self._surveys),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _get_mtimes(self):
+        return {
+            path: os.stat(path).st_mtime
+            for path in (os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith(".json"))
+        }
+
+    def _reload_if_changed(self):
+        with self._lock:
+            if self._get_mtimes() == self._mtimes:
+                return
+            try:
+                self.load()
+            except ValueError:
+                logger.exception("Could not reload survey definitions, keeping those already loaded")
+                # Don't try again until the files change again
+                self._mtimes = self._get_mtimes()
+
+
+surveys = SurveyRegistry(reload=settings.SURVEY_RELOAD)
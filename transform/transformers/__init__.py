@@ -1,5 +1,6 @@
 from .cora_transformer import CORATransformer
 from .pdf_transformer import PDFTransformer
 from .image_transformer import ImageTransformer
+from .cora_batch_transformer import CORABatchTransformer
 
-__all__ = ['CORATransformer', 'PDFTransformer', 'ImageTransformer']
+__all__ = ['CORATransformer', 'PDFTransformer', 'ImageTransformer', 'CORABatchTransformer']
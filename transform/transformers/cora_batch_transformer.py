@@ -0,0 +1,138 @@
+import json
+
+from transform import settings
+
+from transform.transformers.cora_column_coder import CORAColumnCoder
+from transform.transformers.cora_transformer import CORATransformer, CORAValidationError
+from transform.transformers.image_sequence import allocate_image_sequence
+from transform.transformers.in_memory_zip import InMemoryZip
+
+
+class CORABatchTransformer:
+    """Transforms many survey responses into a single zip.
+
+    Each response gets its own sequence number, counting up from the one the
+    batch starts at, and the images for the whole batch are numbered from a
+    single sdx-sequence allocation. A failure in one response is recorded in
+    the manifest rather than failing the batch.
+    """
+
+    MANIFEST_NAME = "manifest.json"
+
+    _coder = CORAColumnCoder()
+
+    def __init__(self, logger, sequence_no=1000):
+        self._logger = logger
+        self._sequence_no = sequence_no
+        self._manifest = []
+        self._transformers = []
+        self.zip = InMemoryZip()
+
+    def add(self, survey, response):
+        """Queue a response and the survey definition it was submitted against"""
+        item = self._add_item(tx_id=response.get("tx_id"))
+        self._transformers.append(
+            (item, CORATransformer(self._logger, survey, response, item["sequence_no"]))
+        )
+
+    def add_error(self, error, tx_id=None):
+        """Record a response which could not be queued, keeping its place in the batch"""
+        item = self._add_item(tx_id=tx_id)
+        self._fail(item, error)
+
+    def create_zip(self):
+        """Create the batch zip, with a manifest recording the outcome for each response"""
+        self._code_responses()
+
+        # Every pdf is rendered first, so the whole batch's images can be
+        # numbered from one allocation. The pdfs are small and kept for their
+        # files; only one response's page images are held at once.
+        rendered = []
+        for item, transformer in self._transformers:
+            try:
+                transformer.image_transformer.render()
+            except Exception as e:
+                self._fail(item, "Could not render pdf: {0}".format(repr(e)))
+            else:
+                rendered.append((item, transformer))
+        self._transformers = []
+
+        num_sequence = self._get_image_sequence(
+            sum(transformer.image_transformer.page_count for _, transformer in rendered)
+        )
+
+        with self.zip as zip_file:
+            for item, transformer in rendered:
+                try:
+                    entries = list(transformer.get_entries(num_sequence))
+                except Exception as e:
+                    self._fail(item, "Could not create files: {0}".format(repr(e)))
+                    continue
+                finally:
+                    transformer.image_transformer.release()
+
+                for filename, contents in entries:
+                    zip_file.append(filename, contents)
+                item["status"] = "ok"
+                item["files"] = [filename for filename, _ in entries]
+
+            zip_file.append(self.MANIFEST_NAME, json.dumps(self._manifest, indent=2))
+        self.zip.rewind()
+
+        failures = sum(1 for item in self._manifest if item["status"] != "ok")
+        self._logger.info("CORA:batch complete", items=len(self._manifest), failures=failures)
+
+    def get_zip(self):
+        """Get access to the in memory zip """
+        self.zip.rewind()
+        return self.zip.in_memory_zip
+
+    @property
+    def manifest(self):
+        return self._manifest
+
+    def _add_item(self, tx_id=None):
+        item = {
+            "index": len(self._manifest),
+            "tx_id": tx_id,
+            "sequence_no": self._sequence_no + len(self._manifest),
+            "status": "pending",
+        }
+        self._manifest.append(item)
+        return item
+
+    def _fail(self, item, error):
+        item["status"] = "error"
+        item["error"] = error
+        self._logger.error("CORA:batch item failed", index=item["index"], tx_id=item["tx_id"], error=error)
+
+    def _code_responses(self):
+        """Codes every response's tkn file at once. A response with invalid
+        fields is failed here, before any images are numbered for it; any
+        other which can't be coded is left to fail, and be reported, when its
+        files are created."""
+        def on_invalid(i, fields):
+            self._transformers[i][1].check_fields(fields)
+
+        try:
+            tkns = self._coder.tkn([transformer._response for _, transformer in self._transformers],
+                                   None if settings.CORA_VALIDATION == "off" else on_invalid)
+        except Exception:
+            self._logger.exception("CORA:batch could not code responses together")
+            return
+
+        coded = []
+        for (item, transformer), tkn in zip(self._transformers, tkns):
+            if isinstance(tkn, CORAValidationError):
+                self._fail(item, "Could not create files: {0}".format(repr(tkn)))
+                continue
+            if not isinstance(tkn, Exception):
+                transformer.coded_tkn = tkn
+            coded.append((item, transformer))
+        self._transformers = coded
+
+    def _get_image_sequence(self, n):
+        if n == 0:
+            return iter(())
+
+        return iter(allocate_image_sequence(self._logger, n))
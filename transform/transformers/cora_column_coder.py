@@ -0,0 +1,188 @@
+from collections import OrderedDict
+
+from transform.transformers.cora_transformer import CORATransformer
+
+# Stands in for an answer of null in a column, where None is an unanswered question
+_NULL = object()
+
+
+class CORAColumnCoder:
+    """
+    Codes many submissions at once, a question at a time rather than a
+    submission at a time, for re-coding responses in bulk.
+
+    Each processor only looks at its own question's answer, and the answers
+    to any one question across many submissions take only a handful of
+    distinct values. So each column is coded by running the processor once
+    per distinct answer and looking every row's answer up in the result.
+    The processors themselves are the ones CORATransformer uses, so the
+    output is the same as coding each submission with its _transform.
+
+    """
+
+    def __init__(self, plan=CORATransformer._plan, derived=CORATransformer._derived,
+                 validators=CORATransformer._validators):
+        self._plan = plan
+        self._derived = derived
+        self._validators = validators
+
+        questions = [q for q, val, check, op in plan]
+        self._plan_questions = tuple(questions)
+        questions.extend(q for q, rule, args in derived if q not in questions)
+        self.questions = tuple(questions)
+
+        # Questions whose coded answers derived fields are worked out from
+        self._sources = frozenset(arg for q, rule, args in derived for arg in args)
+
+    def code(self, datas):
+        """
+        Codes the data of each submission, returning for each one either an
+        OrderedDict of answers as CORATransformer._transform would, or the
+        exception that coding it raised.
+
+        """
+        columns, errors = self._code(datas, labelled=False)
+        return [
+            errors[i] if i in errors else OrderedDict(zip(self.questions, row))
+            for i, row in enumerate(zip(*columns))
+        ]
+
+    def tkn(self, responses, on_invalid=None):
+        """
+        Returns for each response the contents of its tkn file, or the
+        exception raised coding it.
+
+        With on_invalid, coded answers are checked against their formats and
+        it is called with the index of each response with any which don't
+        match, and a list of their (question id, value). If it raises, that
+        exception is the response's result.
+
+        """
+        columns, errors = self._code([response.get("data", {}) for response in responses], True, on_invalid)
+
+        results = []
+        for i, (response, row) in enumerate(zip(responses, zip(*columns))):
+            if i in errors:
+                results.append(errors[i])
+                continue
+
+            if "data" not in response:
+                results.append(KeyError("data"))
+                continue
+
+            try:
+                prefix = ":".join((
+                    response["survey_id"], response["metadata"]["ru_ref"][:11], "1", response["collection"]["period"], "0", ""
+                ))
+            except (KeyError, TypeError) as e:
+                results.append(e)
+                continue
+
+            results.append(prefix + ("\n" + prefix).join(row) + "\n")
+
+        return results
+
+    def _code(self, datas, labelled, on_invalid=None):
+        """
+        Returns the coded columns in question order, with each answer prefixed
+        by its question id if labelled, and the first exception for each row
+        which could not be coded.
+
+        """
+        errors = {}
+        invalid = {}
+        columns = {}
+        sources = {}
+
+        for (q, val, check, op), column in zip(self._plan, self._columns(datas)):
+            codes, keys = self._code_values(q, op, column, errors)
+
+            if on_invalid is not None:
+                # Each distinct code is checked once
+                valid = self._validators[q]
+                bad = {key for key, code in codes.items() if not valid(code)}
+                if bad:
+                    for i, key in enumerate(keys):
+                        if key in bad:
+                            invalid.setdefault(i, []).append((q, codes[key]))
+
+            if labelled:
+                label = "{0}:".format(q)
+                labels = {key: label + code for key, code in codes.items()}
+                columns[q] = [labels[key] for key in keys]
+                if q in self._sources:
+                    sources[q] = [codes[key] for key in keys]
+            else:
+                columns[q] = sources[q] = [codes[key] for key in keys]
+
+        for q, rule, args in self._derived:
+            label = "{0}:".format(q) if labelled else ""
+            source_columns = [(arg, sources[arg]) for arg in args if arg in sources]
+            coded = []
+            for i, d in enumerate(datas):
+                try:
+                    coded.append(label + rule(args, d, {arg: c[i] for arg, c in source_columns}))
+                except Exception as e:
+                    errors.setdefault(i, e)
+                    coded.append(label)
+            columns[q] = coded
+
+        for i, fields in sorted(invalid.items()):
+            if i not in errors:
+                try:
+                    on_invalid(i, fields)
+                except Exception as e:
+                    errors[i] = e
+
+        return [columns[q] for q in self.questions], errors
+
+    def _columns(self, datas):
+        """Returns the answers to each question in the plan, None where unanswered"""
+        rows = []
+        for d in datas:
+            if None in d.values():
+                rows.append([_NULL if q in d and d[q] is None else d.get(q) for q in self._plan_questions])
+            else:
+                rows.append(list(map(d.get, self._plan_questions)))
+
+        if not rows:
+            return [[] for q in self._plan_questions]
+        return zip(*rows)
+
+    @staticmethod
+    def _code_values(q, op, column, errors):
+        """
+        Codes a column of answers, returning a mapping to codes and the key
+        of each row's code in it. Usually the keys are the answers themselves,
+        so each distinct answer is coded once. A row whose answer can't be
+        coded as a string has the exception in errors.
+
+        """
+        try:
+            keys = set(column)
+        except TypeError:
+            # An answer which can't be hashed, so code this column row by row
+            keys = None
+
+        codes = {}
+        failed = {}
+        for key in (range(len(column)) if keys is None else keys):
+            value = column[key] if keys is None else key
+            try:
+                code = op(q, {} if value is None else {q: None if value is _NULL else value})
+                # numbertype passes answers through, so a null or a json number isn't coded as a string
+                if not isinstance(code, str):
+                    raise TypeError("{0} coded as {1!r}, not a string".format(q, code))
+                codes[key] = code
+            except Exception as e:
+                codes[key] = ""
+                failed[key] = e
+
+        keys = range(len(column)) if keys is None else column
+
+        if failed:
+            for i, key in enumerate(keys):
+                if key in failed:
+                    errors.setdefault(i, failed[key])
+
+        return codes, keys
@@ -1,18 +1,85 @@
 import enum
+import itertools
 import json
 import os.path
 import re
+import string
 from collections import OrderedDict
 from io import StringIO
 
 import dateutil.parser
-from jinja2 import Environment, PackageLoader
 
+from transform import metrics, settings
 from transform.settings import SDX_FTP_IMAGE_PATH, SDX_FTP_DATA_PATH, SDX_FTP_RECEIPT_PATH, SDX_RESPONSE_JSON_PATH
+from transform.stage_graph import StageGraph, get_stage_executor
+from transform.transformers.formatters import format_idbr
 from transform.transformers.image_transformer import ImageTransformer
-from transform.transformers.pdf_transformer_style_cora import CoraPdfTransformerStyle
+from transform.transformers.in_memory_zip import stream_zip
+from transform.transformers.pdf_transformer_style_cora import cora_pdf_style
 
-env = Environment(loader=PackageLoader('transform', 'templates'))
+
+def _compile_plan(defn):
+    """
+    Expands the ranges of a field definition into an ordered tuple of
+    (question id, default, format, processor) slots.
+
+    Question ids which appear more than once keep their first position
+    but take their last declaration, as an OrderedDict would.
+
+    """
+    slots = OrderedDict()
+    for rng, val, check, op in defn:
+        for i in rng:
+            q = "{0:04}".format(i)
+            slots[q] = (q, val, check, op)
+    return tuple(slots.values())
+
+
+def _digits(width):
+    def check(value):
+        return isinstance(value, str) and 0 < len(value) <= width and not value.strip(string.digits)
+    return check
+
+
+# Checks equivalent to _Format patterns which match a fixed set of values or
+# a run of digits, so most fields are validated without the regex engine.
+# Unlike the patterns they don't accept a trailing newline.
+_FIXED_CHECKS = {
+    "zeroone": frozenset(("0", "1")).__contains__,
+    "onetwo": frozenset(("1", "2")).__contains__,
+    "twobin": frozenset(("0", "1", "00", "01", "10", "11")).__contains__,
+    "onehotfour": frozenset(("1000", "0100", "0010", "0001", "0000")).__contains__,
+    "twodigits": _digits(2),
+    "threedigits": _digits(3),
+    "sixdigits": _digits(6),
+    "sevendigits": _digits(7),
+}
+
+
+def _compile_check(fmt, optional):
+    """
+    Returns a function which is true for a coded value matching a _Format.
+    Optional fields, whose default is empty, may also be left empty.
+
+    """
+    check = _FIXED_CHECKS.get(fmt.name)
+    if check is None:
+        def check(value):
+            return isinstance(value, str) and fmt.value.match(value) is not None
+
+    if optional:
+        return lambda value: value == "" or check(value)
+    return check
+
+
+class CORAValidationError(ValueError):
+    """Coded fields did not match their declared formats"""
+
+    def __init__(self, fields):
+        super().__init__("Invalid fields: {0}".format(
+            ", ".join("{0}={1!r}".format(q, value) for q, value in fields)
+        ))
+        self.fields = fields
 
 
 class CORATransformer:
@@ -61,8 +128,8 @@ class CORATransformer:
         sixdigits = re.compile("^[0-9]{1,6}$")
         sevendigits = re.compile("^[0-9]{1,7}$")
         onehotfour = re.compile("^(1000|0100|0010|0001|0000)$")
-        yesno = re.compile("^yes|no$")
-        yesnodk = re.compile("^yes|no|(don.+t know)$")
+        yesno = re.compile("^(yes|no)$")
+        yesnodk = re.compile("^(yes|no|don.+t know)$")
 
     class _Processor:
 
@@ -200,6 +267,32 @@ class CORATransformer:
         (range(2900, 2901, 1), "00", _Format.twobin, _Processor.radioyn21),
     ]
 
+    # Compiled once at import; each submission is coded in one pass over it.
+    _plan = _compile_plan(_defn)
+
+    # Question ids mapped to checks of their coded values
+    _validators = OrderedDict([(q, _compile_check(check, val == "")) for q, val, check, op in _plan])
+
+    class _Derivation:
+
+        @staticmethod
+        def dontknow(qs, data, rv):
+            """'1' when any of the source answers is "Don't know"."""
+            return '1' if any(data.get(q, "").lower().endswith("t know") for q in qs) else '0'
+
+        @staticmethod
+        def noneoftheabove(qs, data, rv):
+            """'1' when none of the coded source fields is '1'."""
+            return '0' if any(rv.get(q) == "1" for q in qs) else '1'
+
+    # Fields generated from other answers once the plan has been applied,
+    # in output order: (question id, derivation, source question ids).
+    _derived = (
+        ("2674", _Derivation.dontknow, ("2672", "2673")),
+        ("0440", _Derivation.noneoftheabove, ("0410", "0420", "0430")),
+        ("2671", _Derivation.noneoftheabove, ("2668", "2669", "2670")),
+    )
+
     def __init__(self, logger, survey, response_data, sequence_no=1000):
         self._logger = logger
         self._survey = survey
@@ -208,26 +301,92 @@ class CORATransformer:
         self._idbr = StringIO()
         self._response_json = StringIO()
         self._tkn = StringIO()
+        # Contents of the tkn file, when already coded along with other submissions
+        self.coded_tkn = None
+        self.timer = metrics.StageTimer()
         self.image_transformer = ImageTransformer(self._logger, self._survey, self._response,
-                                                  CoraPdfTransformerStyle(), sequence_no=self._sequence_no,
-                                                  base_image_path=SDX_FTP_IMAGE_PATH)
+                                                  cora_pdf_style, sequence_no=self._sequence_no,
+                                                  base_image_path=SDX_FTP_IMAGE_PATH, timer=self.timer)
         self._setup_logger()
 
-    def create_zip(self):
+    def create_zip(self, num_sequence=None):
         """ Create a in memory zip from a renumbered sequence"""
-        idbr_name = self._create_idbr()
-        tkn_name = self._create_tkn()
-        response_io_name = self._create_response_json()
+        entries = self.get_entries(num_sequence)
 
-        self.image_transformer.zip.append(os.path.join(SDX_FTP_DATA_PATH, tkn_name), self._tkn.read())
-        self.image_transformer.zip.append(os.path.join(SDX_FTP_RECEIPT_PATH, idbr_name), self._idbr.read())
+        with self.image_transformer.zip as zip_file:
+            for filename, contents in entries:
+                with self.timer.stage("zip"):
+                    zip_file.append(filename, contents)
 
-        self.image_transformer.get_zipped_images()
+        self.image_transformer.zip.rewind()
+        self._log_complete(self.image_transformer.zip.in_memory_zip.getbuffer().nbytes)
+
+    def stream_zip(self):
+        """Returns a generator of the zip's bytes, written as each file is produced.
+        The pdf is rendered, image numbers allocated and every page rasterised
+        and framed before returning, so failures there can be reported before a
+        response starts. pdftoppm's output for the whole pdf is held until the
+        last image is written; it's the zip which isn't."""
+        entries = self.get_entries()
+        # TKN, IDBR and the first image
+        head = list(itertools.islice(entries, 3))
+        return self._stream_chunks(stream_zip(itertools.chain(head, entries)))
+
+    def _stream_chunks(self, chunks):
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+        self._log_complete(size)
+
+    def get_entries(self, num_sequence=None):
+        """Generates (filename, contents) pairs for every file in the zip, in order.
+        Image numbers are taken from num_sequence if given, else from sdx-sequence."""
+        if settings.CORA_PIPELINE:
+            for entry in self._get_entries_pipelined(num_sequence):
+                yield entry
+            return
+
+        with self.timer.stage("idbr"):
+            idbr_name = self._create_idbr()
+        with self.timer.stage("tkn"):
+            tkn_name = self._create_tkn()
+        with self.timer.stage("response_json"):
+            response_io_name = self._create_response_json()
+
+        yield os.path.join(SDX_FTP_DATA_PATH, tkn_name), self._tkn.read()
+        yield os.path.join(SDX_FTP_RECEIPT_PATH, idbr_name), self._idbr.read()
+
+        for entry in self.image_transformer.get_image_entries(num_sequence):
+            yield entry
+
+        yield os.path.join(SDX_RESPONSE_JSON_PATH, response_io_name), self._response_json.read()
+
+    def _get_entries_pipelined(self, num_sequence=None):
+        """As get_entries, but rendering first, then making the idbr, tkn and
+        response json while image numbers are allocated and the pdf rasterised.
+        The entries are in the same order."""
+        graph = StageGraph(get_stage_executor())
+        self.image_transformer.add_stages(graph, num_sequence)
+        graph.add("idbr", self._timed("idbr", self._create_idbr))
+        graph.add("tkn", self._timed("tkn", self._create_tkn))
+        graph.add("response_json", self._timed("response_json", self._create_response_json))
+        results = graph.run()
+
+        entries = [
+            (os.path.join(SDX_FTP_DATA_PATH, results["tkn"]), self._tkn.read()),
+            (os.path.join(SDX_FTP_RECEIPT_PATH, results["idbr"]), self._idbr.read()),
+        ]
+        entries.extend(self.image_transformer.image_entries(results["rasterise"]))
+        entries.append((os.path.join(SDX_RESPONSE_JSON_PATH, results["response_json"]), self._response_json.read()))
 
-        self.image_transformer.zip.append(os.path.join(SDX_RESPONSE_JSON_PATH, response_io_name),
-                                          self._response_json.read())
+        return entries
 
-        self.image_transformer.zip.rewind()
+    def _timed(self, name, function):
+        def stage():
+            with self.timer.stage(name):
+                return function()
+        return stage
 
     def get_zip(self):
         """Get access to the in memory zip """
@@ -235,23 +394,27 @@ class CORATransformer:
         return self.image_transformer.zip.in_memory_zip
 
     def _create_tkn(self):
-        data = CORATransformer._transform(self._response["data"])
-        output = CORATransformer._tkn_lines(
-            surveyCode=self._response["survey_id"],
-            ruRef=self._response["metadata"]["ru_ref"][:11],
-            period=self._response["collection"]["period"],
-            data=data
-        )
-        for row in output:
-            self._tkn.write(row)
-            self._tkn.write("\n")
+        if self.coded_tkn is not None:
+            self._tkn.write(self.coded_tkn)
+        else:
+            data = CORATransformer._transform(self._response["data"])
+            if settings.CORA_VALIDATION != "off":
+                self.check_fields(CORATransformer._invalid_fields(data))
+            output = CORATransformer._tkn_lines(
+                surveyCode=self._response["survey_id"],
+                ruRef=self._response["metadata"]["ru_ref"][:11],
+                period=self._response["collection"]["period"],
+                data=data
+            )
+            for row in output:
+                self._tkn.write(row)
+                self._tkn.write("\n")
         self._tkn.seek(0)
         tkn_name = "{0}_{1:04}".format(self._survey["survey_id"], self._sequence_no)
         return tkn_name
 
     def _create_idbr(self):
-        template = env.get_template('idbr.tmpl')
-        template_output = template.render(response=self._response)
+        template_output = format_idbr(self._response)
         submission_date = dateutil.parser.parse(self._response['submitted_at'])
         submission_date_str = submission_date.strftime("%d%m")
 
@@ -262,6 +425,23 @@ class CORATransformer:
         self._idbr.seek(0)
         return idbr_name
 
+    def check_fields(self, invalid):
+        """Rejects or logs coded (question id, value) fields which don't match
+        their formats, as CORA_VALIDATION is strict or warn."""
+        if not invalid:
+            return
+        if settings.CORA_VALIDATION == "strict":
+            raise CORAValidationError(invalid)
+        self._logger.warning("CORA:coded fields do not match their formats",
+                             fields=["{0}={1!r}".format(q, value) for q, value in invalid])
+
+    def _log_complete(self, size):
+        page_count = self.image_transformer.page_count
+        metrics.pages.observe(page_count)
+        metrics.output_bytes.observe(size)
+        self._logger.info("CORA:transform complete", tx_id=self._response.get("tx_id"), pages=page_count, bytes=size,
+                          **self.timer.log_fields())
+
     def _setup_logger(self):
         if self._survey:
             if 'metadata' in self._survey:
@@ -286,11 +466,7 @@ class CORATransformer:
         Returns a dictionary mapping question ids to field formats.
 
         """
-        return OrderedDict([
-            ("{0:04}".format(i), check)
-            for rng, val, check, op in CORATransformer._defn
-            for i in rng
-        ])
+        return OrderedDict([(q, check) for q, val, check, op in CORATransformer._plan])
 
     @staticmethod
     def _ops():
@@ -298,58 +474,34 @@ class CORATransformer:
         Returns a dictionary mapping question ids to field operations.
 
         """
-        return OrderedDict([
-            ("{0:04}".format(i), op)
-            for rng, val, check, op in CORATransformer._defn
-            for i in rng
-        ])
+        return OrderedDict([(q, op) for q, val, check, op in CORATransformer._plan])
 
     @staticmethod
     def _defaults():
         """
         Returns a dictionary mapping question ids to default values.
         """
-        return OrderedDict([
-            ("{0:04}".format(i), val)
-            for rng, val, check, op in CORATransformer._defn
-            for i in rng
-        ])
+        return OrderedDict([(q, val) for q, val, check, op in CORATransformer._plan])
 
     @staticmethod
-    def _transform(data):
-        rv = CORATransformer._defaults()
-        ops = CORATransformer._ops()
-
-        # Don't know generation
-        if any(data.get(q, "").lower().endswith("t know") for q in ("2672", "2673")):
-            rv["2674"] = "1"
-        else:
-            rv["2674"] = "0"
-
-        for q in rv:
-
-            if q == '10001':
-                del rv[q]
-
-            # Run the processors
-            try:
-                op = ops[q]
-            except KeyError:
-                continue
-            else:
-                rv[q] = op(q, data)
+    def _invalid_fields(data):
+        """
+        Returns the (question id, value) of each coded field which doesn't
+        match its format.
 
-        # None-of-the-above generation
-        if not any(rv.get(k) == "1" for k in ("0410", "0420", "0430")):
-            rv["0440"] = "1"
-        else:
-            rv["0440"] = "0"
+        """
+        return [(q, data[q]) for q, valid in CORATransformer._validators.items() if not valid(data[q])]
 
-        if not any(rv.get(k) == "1" for k in ("2668", "2669", "2670")):
-            rv["2671"] = "1"
-        else:
-            rv["2671"] = "0"
+    @staticmethod
+    def _transform(data):
+        """
+        Codes a submission's data in a single pass over the field plan, then
+        appends the derived fields.
 
+        """
+        rv = OrderedDict([(q, op(q, data)) for q, val, check, op in CORATransformer._plan])
+        for q, rule, args in CORATransformer._derived:
+            rv[q] = rule(args, data, rv)
         return rv
 
     @staticmethod
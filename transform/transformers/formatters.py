@@ -0,0 +1,56 @@
+from transform import settings
+from transform.views.image_filters import (
+    env, format_period, page_filter, scan_id_filter, statistical_unit_id_filter, trim_final_newline
+)
+
+
+def _int(value):
+    """As jinja's int filter"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return 0
+
+
+def format_idbr(response):
+    """Returns the idbr receipt for a response, the same as idbr.tmpl renders it"""
+    if settings.RENDER_WITH_TEMPLATES:
+        return env.get_template('idbr.tmpl').render(response=response)
+
+    ru_ref = response['metadata']['ru_ref']
+    return "{0}:{1}:{2}:20{3}".format(
+        ru_ref[0:11], ru_ref[11:12], '%03d' % _int(response['survey_id']),
+        response['collection'].get('period', '')
+    )
+
+
+def format_index(response, images, creation_time, images_path):
+    """Returns the index csv listing a response's images, a line per image,
+    the same as csv.tmpl renders it"""
+    if settings.RENDER_WITH_TEMPLATES:
+        return env.get_template('csv.tmpl').render(
+            SDX_FTP_IMAGES_PATH=images_path,
+            images=images,
+            response=response,
+            creation_time=creation_time
+        )
+
+    collection = response['collection']
+
+    # Every line has the same fields around the image name and page number
+    head = "{0},{1}\\".format(creation_time['long'], images_path)
+    middle = ",{0},".format(creation_time['short'])
+    tail = ",{0},{1},{2},{3},".format(
+        response.get('survey_id', ''),
+        collection.get('instrument_id', ''),
+        statistical_unit_id_filter(response['metadata']['ru_ref']),
+        format_period(collection.get('period', '')),
+    )
+
+    return trim_final_newline("".join(
+        "{0}{1}{2}{3}{4}{5}\n".format(head, image, middle, scan_id_filter(image), tail, page_filter(page))
+        for page, image in enumerate(images, 1)
+    ))
@@ -0,0 +1,48 @@
+from collections import namedtuple
+
+from transform import settings
+
+# pdftoppm's defaults
+DPI = 150
+QUALITY = 75
+
+
+class ImageProfile(namedtuple("ImageProfile", "dpi quality grey progressive optimise")):
+    """How a survey's page images are made: their resolution, jpeg quality, whether
+    they are greyscale, and whether the jpegs are progressive and have optimised
+    Huffman tables"""
+
+    __slots__ = ()
+
+    def pdftoppm_args(self):
+        """pdftoppm options for the profile. Those left at pdftoppm's defaults are
+        left out, so older versions of pdftoppm without -jpegopt still work."""
+        args = []
+        if self.dpi != DPI:
+            args += ["-r", str(self.dpi)]
+        if self.grey:
+            args.append("-gray")
+
+        jpeg_options = []
+        if self.quality != QUALITY:
+            jpeg_options.append("quality={0}".format(self.quality))
+        if self.progressive:
+            jpeg_options.append("progressive=y")
+        if self.optimise:
+            jpeg_options.append("optimize=y")
+        if jpeg_options:
+            args += ["-jpegopt", ",".join(jpeg_options)]
+
+        return args
+
+
+def default_profile():
+    """The profile set by settings, used for surveys without one of their own"""
+    return ImageProfile(settings.IMAGE_DPI, settings.IMAGE_QUALITY, settings.IMAGE_GREY,
+                        settings.IMAGE_PROGRESSIVE, settings.IMAGE_OPTIMISE)
+
+
+def get_image_profile(survey):
+    """The profile for a survey: the default, with anything set in the survey
+    definition's image_profile replacing it"""
+    return default_profile()._replace(**survey.get("image_profile", {}))
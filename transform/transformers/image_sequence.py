@@ -0,0 +1,243 @@
+import atexit
+from collections import deque
+import fcntl
+import json
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from structlog import wrap_logger
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+from transform import settings
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+# Configure the number of retries attempted before failing call
+session = requests.Session()
+
+retries = Retry(total=5, backoff_factor=0.1)
+
+session.mount('http://', HTTPAdapter(max_retries=retries))
+session.mount('https://', HTTPAdapter(max_retries=retries))
+
+
+class ImageSequenceError(Exception):
+    """Image sequence numbers could not be obtained from sdx-sequence"""
+
+
+def _response_ok(logger, res):
+    if res is None:
+        return False
+    if res.status_code == 200:
+        logger.info("Returned from sdx-sequence",
+                    request_url=res.url, status=res.status_code)
+        return True
+    else:
+        logger.error("Returned from sdx-sequence",
+                     request_url=res.url, status=res.status_code)
+        return False
+
+
+def _remote_call(logger, request_url, json=None):
+    try:
+        logger.info("Calling sdx-sequence", request_url=request_url)
+
+        r = None
+
+        if json:
+            r = session.post(request_url, json=json)
+        else:
+            r = session.get(request_url)
+
+        return r
+    except (MaxRetryError, requests.exceptions.RequestException):
+        logger.error("Max retries exceeded (5)", request_url=request_url)
+
+
+def get_image_sequence_list(logger, n):
+    """Requests a list of n image sequence numbers from sdx-sequence.
+    Returns False if the numbers could not be obtained.
+    """
+    sequence_url = "{0}/image-sequence?n={1}".format(settings.SDX_SEQUENCE_URL, n)
+
+    r = _remote_call(logger, sequence_url)
+
+    if not _response_ok(logger, r):
+        return False
+
+    result = r.json()
+    return result['sequence_list']
+
+
+def _to_runs(numbers):
+    """Collapses numbers into [first, last] runs of consecutive values"""
+    runs = []
+    for n in numbers:
+        if runs and runs[-1][1] == n - 1:
+            runs[-1][1] = n
+        else:
+            runs.append([n, n])
+    return runs
+
+
+class ImageSequenceAllocator:
+    """Hands out image sequence numbers from blocks reserved from sdx-sequence
+    ahead of time, so most requests don't need to call it at all.
+
+    Once fewer than low_water numbers are left another block is reserved in
+    the background. Blocks are fetched without holding the lock, so other
+    threads can carry on handing out what's left meanwhile.
+
+    With a state_dir, the numbers reserved but not yet handed out are saved
+    when the allocator is closed and used again after a restart. They are
+    taken out of the state file when it's claimed, so a worker which dies
+    without closing loses its numbers rather than handing them out twice.
+    Each allocator claims its own state file with an exclusive lock, so
+    several workers can share a state_dir.
+    """
+
+    MAX_STATE_FILES = 256
+
+    def __init__(self, block_size, low_water=None, state_dir=None):
+        self.block_size = block_size
+        self.low_water = block_size // 5 if low_water is None else low_water
+        self._numbers = deque()
+        self._lock = threading.Lock()
+        self._refill = None
+        self._state_path = None
+        self._state_lock = None
+
+        if state_dir:
+            self._claim_state(state_dir)
+
+    def allocate(self, n):
+        """Returns a list of n unused image sequence numbers"""
+        while True:
+            with self._lock:
+                if len(self._numbers) >= n:
+                    numbers = [self._numbers.popleft() for _ in range(n)]
+
+                    if len(self._numbers) < self.low_water and self._refill is None:
+                        self._refill = threading.Thread(target=self._refill_in_background, daemon=True)
+                        self._refill.start()
+
+                    return numbers
+
+                refill = self._refill
+                wanted = max(self.block_size, n - len(self._numbers))
+
+            if refill is not None:
+                # A block is on its way; if it isn't enough, or never comes, fetch another
+                refill.join()
+                continue
+
+            fetched = self._fetch(wanted)
+            with self._lock:
+                self._numbers.extend(fetched)
+
+    def remaining(self):
+        return len(self._numbers)
+
+    def close(self):
+        """Waits for any background reservation, then saves the numbers left
+        and releases the state file"""
+        refill = self._refill
+        if refill is not None:
+            refill.join()
+        if self._state_lock is not None:
+            with self._lock:
+                self._save()
+            self._state_lock.close()
+            self._state_lock = None
+
+    def _fetch(self, n):
+        numbers = get_image_sequence_list(logger, n)
+        if not numbers:
+            raise ImageSequenceError("Could not reserve {0} image sequence numbers".format(n))
+        logger.info("Reserved image sequence numbers", count=len(numbers))
+        return numbers
+
+    def _refill_in_background(self):
+        try:
+            numbers = self._fetch(self.block_size)
+        except ImageSequenceError:
+            # The next allocation that runs out will try again, and fail if it can't
+            logger.exception("Could not reserve image sequence numbers in the background")
+            numbers = []
+
+        with self._lock:
+            self._numbers.extend(numbers)
+            self._refill = None
+
+    def _claim_state(self, state_dir):
+        os.makedirs(state_dir, exist_ok=True)
+
+        for i in range(self.MAX_STATE_FILES):
+            path = os.path.join(state_dir, "image-sequence-{0}".format(i))
+            lock = open(path + ".lock", "a")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                continue
+
+            self._state_lock = lock
+            self._state_path = path + ".json"
+            break
+        else:
+            raise ImageSequenceError("No free image sequence state file in {0}".format(state_dir))
+
+        try:
+            with open(self._state_path) as fp:
+                runs = json.load(fp)
+        except FileNotFoundError:
+            runs = []
+
+        for first, last in runs:
+            self._numbers.extend(range(first, last + 1))
+        # They're only held in memory now, until they're saved on close
+        self._save([])
+
+        logger.info("Claimed image sequence state", path=self._state_path, remaining=len(self._numbers))
+
+    def _save(self, numbers=None):
+        if self._state_path is None:
+            return
+
+        # Written to one side and renamed, so a crash leaves the old state or the new, never a mix
+        temp_path = self._state_path + ".tmp"
+        with open(temp_path, "w") as fp:
+            json.dump(_to_runs(self._numbers if numbers is None else numbers), fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temp_path, self._state_path)
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def allocate_image_sequence(logger, n):
+    """Returns a list of n image sequence numbers, from the block allocator if
+    one is configured, else from a call to sdx-sequence."""
+    if settings.IMAGE_SEQUENCE_BLOCK_SIZE > 0:
+        return _get_allocator().allocate(n)
+
+    numbers = get_image_sequence_list(logger, n)
+    if numbers is False:
+        raise ImageSequenceError("Could not get {0} image sequence numbers".format(n))
+    return numbers
+
+
+def _get_allocator():
+    global _allocator
+    with _allocator_lock:
+        if _allocator is None:
+            _allocator = ImageSequenceAllocator(settings.IMAGE_SEQUENCE_BLOCK_SIZE,
+                                                state_dir=settings.IMAGE_SEQUENCE_STATE_DIR)
+            atexit.register(_allocator.close)
+        return _allocator
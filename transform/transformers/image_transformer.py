@@ -1,24 +1,13 @@
 import datetime
 import os.path
-import requests
-import subprocess
 
-from requests.adapters import HTTPAdapter
-from urllib3.exceptions import MaxRetryError
-from urllib3.util.retry import Retry
-
-from transform import settings
+from transform.metrics import StageTimer
+from transform.transformers.image_profile import get_image_profile
+from transform.transformers.image_sequence import allocate_image_sequence
 from transform.transformers.in_memory_zip import InMemoryZip
 from transform.transformers.index_file import IndexFile
 from transform.transformers.pdf_transformer import PDFTransformer
-
-# Configure the number of retries attempted before failing call
-session = requests.Session()
-
-retries = Retry(total=5, backoff_factor=0.1)
-
-session.mount('http://', HTTPAdapter(max_retries=retries))
-session.mount('https://', HTTPAdapter(max_retries=retries))
+from transform.transformers.rasteriser import get_rasteriser, jpeg_frames
 
 
 class ImageTransformer:
@@ -26,7 +15,7 @@ class ImageTransformer:
     """
 
     def __init__(self, logger, survey, response, pdf_style, current_time=None, sequence_no=1000,
-                 base_image_path=""):
+                 base_image_path="", timer=None):
 
         if current_time is None:
             current_time = datetime.datetime.utcnow()
@@ -44,17 +33,55 @@ class ImageTransformer:
         self.image_path = "" if base_image_path == "" else os.path.join(base_image_path, "Images")
         self.index_path = "" if base_image_path == "" else os.path.join(base_image_path, "Index")
         self.pdf_style = pdf_style
+        self.profile = get_image_profile(survey)
+        self.timer = StageTimer() if timer is None else timer
 
     def get_zipped_images(self, num_sequence=None):
         """Builds the images and the index_file file into the zip file.
         It appends data to the zip , so any data in the zip
         prior to this executing is not deleted.
         """
-        self._create_pdf(self.survey, self.response)
+        with self.zip as zip_file:
+            for filename, contents in self.get_image_entries(num_sequence):
+                with self.timer.stage("zip"):
+                    zip_file.append(filename, contents)
+        self.zip.rewind()
+        return self.zip
+
+    def get_image_entries(self, num_sequence=None):
+        """Generates (filename, contents) pairs for the images and the index_file,
+        in the order they belong in the zip. The pdf is only rendered if it has
+        not been already.
+        """
+        self.render()
         self._build_image_names(num_sequence, self._page_count)
         self._create_index()
-        self._build_zip()
-        return self.zip
+
+        for i, image in enumerate(self._rasterise()):
+            yield os.path.join(self.image_path, self._image_names[i]), image
+
+        yield os.path.join(self.index_path, self.index_file.index_name), self.index_file.in_memory_index.getvalue()
+
+    def add_stages(self, graph, num_sequence=None):
+        """Adds the stages making the images and index_file to a StageGraph.
+        Once the pdf is rendered, image numbers are allocated while it is
+        rasterised. The "rasterise" stage's result is the page jpegs, for
+        image_entries.
+        """
+        graph.add("render", self.render)
+        graph.add("image_sequence", lambda: self._build_image_names(num_sequence, self._page_count),
+                  requires=["render"], blocking=num_sequence is None)
+        graph.add("rasterise", self._rasterise, requires=["render"], blocking=True)
+        graph.add("index", self._create_index, requires=["image_sequence"])
+
+    def image_entries(self, images):
+        """(filename, contents) pairs for the page jpegs and the index_file, in
+        the order they belong in the zip"""
+        entries = [(os.path.join(self.image_path, self._image_names[i]), image)
+                   for i, image in enumerate(images)]
+        entries.append((os.path.join(self.index_path, self.index_file.index_name),
+                        self.index_file.in_memory_index.getvalue()))
+        return entries
 
     @staticmethod
     def _get_image_name(i):
@@ -63,14 +90,38 @@ class ImageTransformer:
     def _create_pdf(self, survey, response):
         """Create a pdf which will be used as the basis for images """
         pdf_transformer = PDFTransformer(survey, response, self.pdf_style)
-        self._pdf, self._page_count = pdf_transformer.render_pages()
+        with self.timer.stage("render"):
+            self._pdf, self._page_count = pdf_transformer.render_pages()
 
         return self._pdf
 
+    @property
+    def page_count(self):
+        """Pages in the rendered pdf, -1 until it has been rendered"""
+        return self._page_count
+
+    def render(self):
+        """Renders the pdf if not done already, returning the page count"""
+        if self._pdf is None:
+            self._create_pdf(self.survey, self.response)
+        return self._page_count
+
+    def release(self):
+        """Drops the rendered pdf, keeping the page count. It is rendered again
+        if needed."""
+        self._pdf = None
+
+    def _rasterise(self):
+        """The page jpegs, rasterised from the pdf"""
+        with self.timer.stage("rasterise"):
+            return self._extract_pdf_images(self._pdf, self._page_count, self.profile)
+
     def _build_image_names(self, num_sequence, image_count):
         """Build a collection of image names to use later"""
         if num_sequence is None:
-            for image_sequence in self._get_image_sequence_list(image_count):
+            with self.timer.stage("image_sequence"):
+                sequence_list = self._get_image_sequence_list(image_count)
+            for image_sequence in sequence_list:
                 self._image_names.append(ImageTransformer._get_image_name(image_sequence))
         else:
             for _ in range(0, image_count):
@@ -78,69 +129,21 @@ class ImageTransformer:
                 self._image_names.append(name)
 
     def _create_index(self):
-        self.index_file = IndexFile(self.logger, self.response, self._page_count, self._image_names,
-                                    self.current_time, self.sequence_no)
-
-    def _build_zip(self):
-        i = 0
-        for image in self._extract_pdf_images(self._pdf):
-            self.zip.append(os.path.join(self.image_path, self._image_names[i]), image)
-            i += 1
-        self.zip.append(os.path.join(self.index_path, self.index_file.index_name), self.index_file.in_memory_index.getvalue())
-        self.zip.rewind()
+        with self.timer.stage("index"):
+            self.index_file = IndexFile(self.logger, self.response, self._page_count, self._image_names,
+                                        self.current_time, self.sequence_no)
 
     @staticmethod
-    def _extract_pdf_images(pdf_stream):
+    def _extract_pdf_images(pdf_stream, page_count=None, profile=None):
         """
         Extract pdf pages as jpegs
         """
 
-        process = subprocess.Popen(["pdftoppm", "-jpeg"],
-                                   stdin=subprocess.PIPE,
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE)
-        result, errors = process.communicate(pdf_stream)
-
-        if errors:
-            raise IOError("images:Could not extract Images from pdf: {0}".format(repr(errors)))
-
-        # FFD9 is an end of image marker in jpeg images
-        for image in result.split(b'\xFF\xD9'):
-            if len(image) > 11:  # we can get an end of file marker after the image and a jpeg header is 11 bytes long
-                yield image
-
-    def _response_ok(self, res):
-        if res.status_code == 200:
-            self.logger.info("Returned from sdx-sequence",
-                             request_url=res.url, status=res.status_code)
-            return True
-        else:
-            self.logger.error("Returned from sdx-sequence",
-                              request_url=res.url, status=res.status_code)
-            return False
+        result = get_rasteriser().rasterise(pdf_stream, page_count, profile)
 
-    def _remote_call(self, request_url, json=None):
-        try:
-            self.logger.info("Calling sdx-sequence", request_url=request_url)
-
-            r = None
-
-            if json:
-                r = session.post(request_url, json=json)
-            else:
-                r = session.get(request_url)
-
-            return r
-        except MaxRetryError:
-            self.logger.error("Max retries exceeded (5)", request_url=request_url)
+        # Every page is framed before any is used, so corrupt output fails the
+        # transform before a streamed response has started
+        return list(jpeg_frames(result))
 
     def _get_image_sequence_list(self, n):
-        sequence_url = "{0}/image-sequence?n={1}".format(settings.SDX_SEQUENCE_URL, n)
-
-        r = self._remote_call(sequence_url)
-
-        if not self._response_ok(r):
-            return False
-
-        result = r.json()
-        return result['sequence_list']
+        return allocate_image_sequence(self.logger, n)
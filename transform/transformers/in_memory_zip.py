@@ -1,30 +1,107 @@
 from io import BytesIO
-from zipfile import ZIP_DEFLATED, ZipFile
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+
+# Already compressed, so deflating them again costs CPU for no gain
+STORED_EXTENSIONS = ('.jpg', '.jpeg')
+
+
+def _compress_type(filename):
+    return ZIP_STORED if filename.lower().endswith(STORED_EXTENSIONS) else ZIP_DEFLATED
 
 
 class InMemoryZip:
-    """Class for creating in memory Zip objects using BytesIO."""
+    """Class for creating in memory Zip objects using BytesIO.
+
+    One ZipFile handle stays open while files are appended, so the central
+    directory is written once, when the zip is closed, rather than after
+    every file. As a context manager it is closed however appending ends,
+    so no ZipFile is left open on the buffer.
+    """
+
     def __init__(self):
-        self.in_memory_zip = BytesIO()
+        self._buffer = BytesIO()
+        self._zip_file = None
 
-    def append(self, filename_in_zip, file_contents):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def in_memory_zip(self):
+        """The zip file as a BytesIO, closed first if files are still being appended"""
+        self.close()
+        return self._buffer
+
+    def append(self, filename_in_zip, file_contents, compress_type=None):
         """Appends a file with name filename_in_zip and contents of
-        file_contents to the in-memory zip."""
-        # Get a handle to the in-memory zip in append mode
-        zf = ZipFile(self.in_memory_zip, "a", ZIP_DEFLATED, False)
+        file_contents to the in-memory zip. Files are deflated unless they are
+        already compressed images, or compress_type says otherwise."""
+        if compress_type is None:
+            compress_type = _compress_type(filename_in_zip)
 
-        # Write the file to the in-memory zip
-        zf.writestr(filename_in_zip, file_contents)
-        zf.close()
+        if self._zip_file is None:
+            # Append mode, so a zip which has been closed can still be added to
+            self._zip_file = ZipFile(self._buffer, "a", ZIP_DEFLATED, False)
+
+        self._zip_file.writestr(filename_in_zip, file_contents, compress_type)
         return self
 
+    def close(self):
+        """Writes the central directory, completing the zip file"""
+        if self._zip_file is not None:
+            self._zip_file.close()
+            self._zip_file = None
+
     def rewind(self):
         """Rewind current file position to the start of in memory file"""
-        self.in_memory_zip.seek(0)
+        self.close()
+        self._buffer.seek(0)
 
     def get_filenames(self):
         """Returns a list of filenames currently in the zipfile"""
-        zf = ZipFile(self.in_memory_zip, "r", ZIP_DEFLATED, False)
+        self.close()
+        zf = ZipFile(self._buffer, "r", ZIP_DEFLATED, False)
         file_names = zf.namelist()
         zf.close()
         return file_names
+
+
+class _ChunkBuffer:
+    """Write-only file object holding what ZipFile writes until it is drained.
+    It can't tell or seek, so ZipFile writes each entry's sizes in a data
+    descriptor after its contents instead of going back to its header."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        # WSGI servers only accept bytes
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def stream_zip(entries):
+    """Generates the bytes of a zip file holding the (filename, contents) entries.
+    Each entry is written out as soon as it is produced, so the whole zip is
+    never held in memory."""
+    buffer = _ChunkBuffer()
+    zf = ZipFile(buffer, "w", ZIP_DEFLATED, False)
+
+    for filename, contents in entries:
+        zf.writestr(filename, contents, _compress_type(filename))
+        for chunk in buffer.drain():
+            yield chunk
+
+    zf.close()
+    for chunk in buffer.drain():
+        yield chunk
@@ -3,7 +3,8 @@ import dateutil.parser
 
 from io import BytesIO
 from transform import settings
-from transform.views.image_filters import get_env, format_date
+from transform.transformers.formatters import format_index
+from transform.dates import format_date
 
 
 class IndexFile:
@@ -33,16 +34,8 @@ class IndexFile:
 
     def _build_index(self, image_names):
         """Builds the in_memory_index file contents into self.in_memory_index"""
-        env = get_env()
-        template = env.get_template('csv.tmpl')
-
         image_path = settings.FTP_PATH + settings.SDX_FTP_IMAGE_PATH + "\\Images"
-        template_output = template.render(
-            SDX_FTP_IMAGES_PATH=image_path,
-            images=image_names,
-            response=self._response,
-            creation_time=self._creation_time
-        )
+        template_output = format_index(self._response, image_names, self._creation_time, image_path)
 
         msg = "Adding image to in_memory_index"
         for image_name in image_names:
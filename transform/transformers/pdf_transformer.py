@@ -1,11 +1,11 @@
-import arrow
-
 from io import BytesIO
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.platypus.flowables import HRFlowable
 
+from transform.dates import format_date
+
 
 class PDFTransformer:
     """
@@ -42,59 +42,96 @@ class PDFTransformer:
         return pdf, doc.page
 
     def _get_elements(self):
-        elements = []
-        table_style_data = [('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                            ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),
-                            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-                            ('BOX', (0, 0), (0, -1), 1, colors.black),
-                            ('BACKGROUND', (0, 0), (1, 0), colors.lightblue)]
-
-        table_style = TableStyle(table_style_data)
-        table_style.spaceAfter = 25
-
-        heading_style = TableStyle(table_style_data)
-        heading_style.spaceAfter = 25
-        heading_style.add('SPAN', (0, 0), (1, 0))
-        heading_style.add('ALIGN', (0, 0), (1, 0), 'CENTER')
+        skeleton = _get_skeleton(self.survey, self.style)
+        answers = self.response['data']
 
         localised_date_str = self._get_localised_date(self.response['submitted_at'])
 
         heading_data = self.style.get_heading_data(self.survey['title'], self.response['collection']['instrument_id'],
                                                    self.response['metadata']['ru_ref'], localised_date_str)
 
-        heading = Table(heading_data, style=heading_style, colWidths='*')
-
-        elements.append(heading)
+        elements = [Table(heading_data, style=skeleton.heading_style, colWidths='*')]
 
-        for question_group in filter(lambda x: 'title' in x, self.survey['question_groups']):
+        for section_title, questions in skeleton.sections:
 
             section_heading = True
 
-            for question in filter(lambda x: 'text' in x, question_group['questions']):
-                if question['question_id'] in self.response['data']:
-                    try:
-                        answer = str(self.response['data'][question['question_id']])
-                    except KeyError:
-                        answer = ''
+            for question_id, question in questions:
+                if question_id in answers:
+                    answer = str(answers[question_id])
 
                     # Output the section header if we haven't already
                     # Checking here so that whole sections are suppressed
                     # if they have no answers.
                     if section_heading:
                         elements.append(HRFlowable(width="100%"))
-                        elements.append(Paragraph(question_group['title'], self.style.style_sh))
+                        elements.append(section_title.paragraph())
                         section_heading = False
 
-                    # Question not output if answer is empty
-                    text = question.get("text")
-                    if not text[0].isdigit():
-                        text = " ".join((question.get("number", ""), text))
-                    elements.append(Paragraph(text, self.style.style_n))
+                    elements.append(question.paragraph())
                     elements.append(Paragraph(answer, self.style.style_answer))
 
         return elements
 
     @staticmethod
     def _get_localised_date(date_to_transform, timezone='Europe/London'):
-        return arrow.get(date_to_transform).to(timezone).format("DD MMMM YYYY HH:mm:ss")
+        return format_date(date_to_transform, "written", timezone)
+
+
+class _ParsedParagraph:
+    """Paragraph text parsed once, from which any number of Paragraphs can be made.
+    Paragraphs only ever change clones of the fragments they are given, so the
+    fragments can be shared."""
+
+    def __init__(self, text, style):
+        self.text = text
+        self.style = style
+        self.frags = Paragraph(text, style).frags
+
+    def paragraph(self):
+        return Paragraph(self.text, self.style, frags=self.frags)
+
+
+class _Skeleton:
+    """The parts of a survey's pdf which don't depend on the answers: table styles,
+    and the parsed section titles and questions in the order they're output"""
+
+    def __init__(self, survey, style):
+        self.survey = survey
+        self.style_class = type(style)
+
+        table_style_data = [('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+                            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                            ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),
+                            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+                            ('BOX', (0, 0), (0, -1), 1, colors.black),
+                            ('BACKGROUND', (0, 0), (1, 0), colors.lightblue)]
+
+        self.heading_style = TableStyle(table_style_data)
+        self.heading_style.spaceAfter = 25
+        self.heading_style.add('SPAN', (0, 0), (1, 0))
+        self.heading_style.add('ALIGN', (0, 0), (1, 0), 'CENTER')
+
+        self.sections = []
+        for question_group in filter(lambda x: 'title' in x, survey['question_groups']):
+            questions = []
+            for question in filter(lambda x: 'text' in x, question_group['questions']):
+                text = question.get("text")
+                if not text[0].isdigit():
+                    text = " ".join((question.get("number", ""), text))
+                questions.append((question['question_id'], _ParsedParagraph(text, style.style_n)))
+
+            self.sections.append((_ParsedParagraph(question_group['title'], style.style_sh), questions))
+
+
+# One skeleton per survey definition and style
+_skeletons = {}
+
+
+def _get_skeleton(survey, style):
+    key = (survey['survey_id'], survey.get('form_type'), type(style))
+    skeleton = _skeletons.get(key)
+    if skeleton is None or skeleton.survey is not survey:
+        skeleton = _Skeleton(survey, style)
+        _skeletons[key] = skeleton
+    return skeleton
@@ -6,9 +6,35 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import Paragraph
 
 
+class _ReadOnlyParagraphStyle(ParagraphStyle):
+    """A copy of a paragraph style which can't be changed"""
+
+    def __init__(self, style):
+        self.__dict__.update(style.__dict__)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Cora paragraph styles are read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("Cora paragraph styles are read-only")
+
+    def clone(self, name, parent=None, **kwds):
+        """A plain ParagraphStyle copy, which can be changed"""
+        style = ParagraphStyle(name)
+        style.__dict__.update(self.__dict__)
+        style.name = name
+        style.parent = self if parent is None else parent
+        style._setKwds(**kwds)
+        return style
+
+
 class CoraPdfTransformerStyle:
     """
     SDX Cora PDF Transformer styles.
+
+    The styles are copies, so the sample stylesheet is never changed, and
+    neither they nor their attributes can be changed once built, so one
+    instance can be shared between threads.
     """
 
     def __init__(self):
@@ -28,20 +54,34 @@ class CoraPdfTransformerStyle:
         self.style_answer.spaceAfter = 20
 
         # Subheading style
-        self.style_sh = styles["Heading2"]
+        self.style_sh = copy(styles["Heading2"])
         self.style_sh.alignment = TA_LEFT
 
         # Sub-subheading style (questions)
-        self.style_ssh = styles["Heading3"]
+        self.style_ssh = copy(styles["Heading3"])
         self.style_ssh.alignment = TA_LEFT
 
         # Main heading style
-        self.style_h = styles['Heading1']
+        self.style_h = copy(styles['Heading1'])
         self.style_h.alignment = TA_CENTER
 
+        for name in ("style_n", "style_answer", "style_sh", "style_ssh", "style_h"):
+            setattr(self, name, _ReadOnlyParagraphStyle(getattr(self, name)))
+
+        self._built = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_built", False):
+            raise AttributeError("CoraPdfTransformerStyle is read-only")
+        super().__setattr__(name, value)
+
     def get_heading_data(self, title, collection_instrument_id, ru_ref, submitted_at):
         heading_data = [[Paragraph(title, self.style_h)]]
         heading_data.append(['Form Type', collection_instrument_id])
         heading_data.append(['Respondent', ru_ref[:11]])
         heading_data.append(['Submitted At', submitted_at])
         return heading_data
+
+
+# Built once and shared by every request
+cora_pdf_style = CoraPdfTransformerStyle()
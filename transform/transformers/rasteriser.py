@@ -0,0 +1,342 @@
+from collections import OrderedDict
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+import logging
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from structlog import wrap_logger
+
+from transform import settings
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+
+class RasterisationError(IOError):
+    """pdftoppm failed, ran out of time or was stopped by a resource limit.
+
+    reason is one of timeout, cpu_limit, memory_limit, signal, error or
+    corrupt_output, for output which isn't whole jpegs, and
+    diagnostics gives the details for logs and error responses.
+    """
+
+    def __init__(self, message, reason, returncode=None, stderr=b"", seconds=None, pages=None):
+        super().__init__(message)
+        self.message = message
+        self.reason = reason
+        self.returncode = returncode
+        self.stderr = stderr
+        self.seconds = seconds
+        self.pages = pages
+
+    def __str__(self):
+        return self.message
+
+    def diagnostics(self):
+        return OrderedDict([
+            ("reason", self.reason),
+            ("returncode", self.returncode),
+            ("seconds", None if self.seconds is None else round(self.seconds, 3)),
+            ("pages", self.pages),
+            ("stderr", self.stderr[-500:].decode("utf-8", "replace")),
+        ])
+
+
+def _pdftoppm_args(path, first=None, last=None, profile=None):
+    args = ["pdftoppm", "-jpeg"]
+    if profile is not None:
+        args += profile.pdftoppm_args()
+    if first is not None:
+        args += ["-f", str(first)]
+    if last is not None:
+        args += ["-l", str(last)]
+    args.append(path)
+    return args
+
+
+def _shared_memory_dir():
+    # Python before 3.8 has no memfd_create, but /dev/shm is a tmpfs on Linux, Docker containers included
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return None
+
+
+@contextmanager
+def pdf_file(pdf_stream):
+    """Writes a pdf where pdftoppm can read it as a file, yielding its path and
+    file descriptor, which must be passed on to pdftoppm.
+
+    The pdf goes in an unnamed temporary file in RASTERISER_SCRATCH_DIR if it is
+    set, else in an anonymous memory file where the system has them, else in an
+    unnamed file in /dev/shm, kept in memory on Linux, or failing that the
+    system's temporary directory. None of these has a name which could be left
+    behind, whatever happens to pdftoppm: each is gone once the descriptor is
+    closed.
+    """
+    if settings.RASTERISER_SCRATCH_DIR is None and hasattr(os, "memfd_create"):
+        fp = open(os.memfd_create("pdf"), "w+b")
+    else:
+        fp = tempfile.TemporaryFile(dir=settings.RASTERISER_SCRATCH_DIR or _shared_memory_dir())
+
+    try:
+        fp.write(pdf_stream)
+        fp.flush()
+        fp.seek(0)
+        yield "/dev/fd/{0}".format(fp.fileno()), fp.fileno()
+    finally:
+        fp.close()
+
+
+def page_ranges(page_count, jobs):
+    """Splits pages 1 to page_count into at most jobs contiguous (first, last) ranges,
+    in page order. Without a page count, the whole pdf is one range."""
+    if not page_count or jobs <= 1 or page_count <= 1:
+        return [(None, None)]
+
+    jobs = min(jobs, page_count)
+    size, extra = divmod(page_count, jobs)
+    ranges = []
+    first = 1
+    for i in range(jobs):
+        last = first + size - 1 + (1 if i < extra else 0)
+        ranges.append((first, last))
+        first = last + 1
+    return ranges
+
+
+def pdftoppm(pdf_stream, timeout=None, first=None, last=None, profile=None):
+    """Rasterise a pdf with pdftoppm, returning its concatenated jpeg output.
+    With first and last, only those pages are rasterised, and with an
+    ImageProfile, the images are made as it says."""
+    with pdf_file(pdf_stream) as pdf:
+        return _pdftoppm_file(pdf, timeout, first, last, profile)
+
+
+def _limit(pid):
+    """Applies the rasterisation CPU and memory limits to a started pdftoppm.
+
+    They're set from outside with prlimit rather than by the child before it
+    runs pdftoppm, as preexec_fn isn't safe in a process with threads. Where
+    prlimit isn't available, as on macOS, pdftoppm runs without limits.
+    """
+    if resource is None or not hasattr(resource, "prlimit"):
+        return
+    try:
+        if settings.RASTERISER_CPU_SECONDS > 0:
+            # SIGXCPU at the soft limit, then SIGKILL a second later if it's ignored
+            resource.prlimit(pid, resource.RLIMIT_CPU,
+                             (settings.RASTERISER_CPU_SECONDS, settings.RASTERISER_CPU_SECONDS + 1))
+        if settings.RASTERISER_MEMORY_BYTES > 0:
+            resource.prlimit(pid, resource.RLIMIT_AS, (settings.RASTERISER_MEMORY_BYTES, settings.RASTERISER_MEMORY_BYTES))
+    except ProcessLookupError:
+        # It has already finished
+        pass
+
+
+def _kill(pid):
+    """Kills pdftoppm and anything it started, which share its process group"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _pages(first, last):
+    return "all" if first is None else "{0}-{1}".format(first, last)
+
+
+def _check(result, errors, returncode, started, first, last):
+    """Returns pdftoppm's output, or raises a RasterisationError saying why it failed"""
+    if returncode == 0 and not errors:
+        return result
+
+    seconds = time.perf_counter() - started
+    pages = _pages(first, last)
+
+    if returncode is not None and returncode < 0:
+        signum = -returncode
+        # SIGKILL is the CPU limit's too, if pdftoppm ignored SIGXCPU
+        cpu_limited = settings.RASTERISER_CPU_SECONDS > 0 and seconds >= settings.RASTERISER_CPU_SECONDS
+        if signum == signal.SIGXCPU or (signum == signal.SIGKILL and cpu_limited):
+            reason = "cpu_limit"
+        else:
+            reason = "signal"
+        message = "images:pdftoppm was killed by signal {0}".format(signum)
+    elif settings.RASTERISER_MEMORY_BYTES > 0 and (b"memory" in errors.lower() or b"bad_alloc" in errors):
+        reason = "memory_limit"
+        message = "images:pdftoppm ran out of memory: {0}".format(repr(errors))
+    else:
+        reason = "error"
+        message = "images:Could not extract Images from pdf: {0}".format(repr(errors))
+
+    raise RasterisationError(message, reason, returncode, errors, seconds, pages)
+
+
+def _timed_out(timeout, started, first, last):
+    return RasterisationError("images:pdftoppm timed out after {0}s".format(timeout), "timeout",
+                              seconds=time.perf_counter() - started, pages=_pages(first, last))
+
+
+class _Processes:
+    """The pdftoppm processes rasterising ranges of one pdf's pages, so the
+    rest can be killed once one fails"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pids = set()
+        self._stopped = False
+
+    def add(self, pid):
+        with self._lock:
+            self._pids.add(pid)
+            stopped = self._stopped
+        if stopped:
+            _kill(pid)
+
+    def discard(self, pid):
+        with self._lock:
+            self._pids.discard(pid)
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            pids = list(self._pids)
+        for pid in pids:
+            _kill(pid)
+
+
+def _pdftoppm_file(pdf, timeout=None, first=None, last=None, profile=None, processes=None):
+    """As pdftoppm, for a pdf written with pdf_file. pdftoppm runs in a session
+    of its own, so it and anything it starts can be killed together, and is
+    added to processes if they're given."""
+    path, fd = pdf
+    started = time.perf_counter()
+    process = subprocess.Popen(_pdftoppm_args(path, first, last, profile),
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               pass_fds=(fd,),
+                               start_new_session=True)
+    if processes is not None:
+        processes.add(process.pid)
+    try:
+        _limit(process.pid)
+        result, errors = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill(process.pid)
+        process.communicate()
+        raise _timed_out(timeout, started, first, last)
+    except BaseException:
+        _kill(process.pid)
+        process.communicate()
+        raise
+    finally:
+        if processes is not None:
+            processes.discard(process.pid)
+
+    return _check(result, errors, process.returncode, started, first, last)
+
+
+# Markers which stand alone, without a length field: TEM and RST0-7
+_STANDALONE_MARKERS = frozenset([0x01] + list(range(0xD0, 0xD8)))
+
+
+def jpeg_frames(data):
+    """Yields each complete jpeg in a concatenated stream as a memoryview over data.
+
+    Segments are skipped using their declared lengths and entropy-coded data
+    is scanned for real markers, so an FFD9 inside a thumbnail or metadata
+    segment does not end an image. Each frame runs from its SOI marker up to
+    and including its EOI marker.
+    """
+    view = memoryview(data)
+    end = len(data)
+    pos = data.find(b"\xFF\xD8")
+
+    while pos >= 0:
+        start = pos
+        pos += 2
+
+        while True:
+            if pos + 1 >= end or data[pos] != 0xFF:
+                raise RasterisationError(
+                    "images:Truncated or corrupt jpeg in rasteriser output at byte {0}".format(pos), "corrupt_output")
+
+            marker = data[pos + 1]
+
+            if marker == 0xFF:
+                # Fill byte before a marker
+                pos += 1
+            elif marker == 0xD9:
+                pos += 2
+                yield view[start:pos]
+                break
+            elif marker in _STANDALONE_MARKERS:
+                pos += 2
+            else:
+                pos += 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+
+                if marker == 0xDA:
+                    # Entropy-coded data follows a start of scan; it ends at the first
+                    # FF which isn't a stuffed zero or a restart marker.
+                    while True:
+                        pos = data.find(b"\xFF", pos)
+                        if pos < 0 or pos + 1 >= end:
+                            raise RasterisationError("images:Truncated jpeg in rasteriser output", "corrupt_output")
+                        following = data[pos + 1]
+                        if following == 0x00 or 0xD0 <= following <= 0xD7:
+                            pos += 2
+                        elif following == 0xFF:
+                            pos += 1
+                        else:
+                            break
+
+        pos = data.find(b"\xFF\xD8", pos)
+
+
+class SubprocessRasteriser:
+    """Starts a new pdftoppm process for every pdf. With page_workers, a pdf
+    of several pages is split into ranges of pages, each rasterised by its
+    own pdftoppm at the same time, and their output joined back in page order.
+    Once one range fails, the others are killed rather than left to finish."""
+
+    def __init__(self, page_workers=1, timeout=None):
+        self.page_workers = page_workers
+        self.timeout = timeout
+
+    def rasterise(self, pdf_stream, page_count=None, profile=None):
+        ranges = page_ranges(page_count, self.page_workers)
+        with pdf_file(pdf_stream) as pdf:
+            if len(ranges) == 1:
+                return _pdftoppm_file(pdf, self.timeout, profile=profile)
+
+            # The threads only wait on pdftoppm, which does the work in its own process
+            processes = _Processes()
+            with ThreadPoolExecutor(len(ranges)) as executor:
+                results = [executor.submit(_pdftoppm_file, pdf, self.timeout, first, last, profile, processes)
+                           for first, last in ranges]
+                done, _ = wait(results, return_when=FIRST_EXCEPTION)
+                failed = [result for result in results if result in done and result.exception() is not None]
+                if failed:
+                    processes.stop()
+                    failed[0].result()
+                return b"".join(result.result() for result in results)
+
+
+_rasteriser = None
+
+
+def get_rasteriser():
+    """Returns the rasteriser configured in settings, shared by the whole process"""
+    global _rasteriser
+    if _rasteriser is None:
+        _rasteriser = SubprocessRasteriser(settings.RASTERISER_PAGE_WORKERS, timeout=settings.RASTERISER_JOB_TIMEOUT)
+    return _rasteriser
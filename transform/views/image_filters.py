@@ -1,16 +1,8 @@
 import os
-from jinja2 import Environment, PackageLoader
-import arrow
+from jinja2 import Environment, FileSystemBytecodeCache, PackageLoader
 
-
-def format_date(value, style='long'):
-    """convert a datetime to a different format."""
-
-    timezone = 'Europe/London'
-    if style is 'short':
-        return arrow.get(value).to(timezone).format("YYYYMMDD")
-    else:
-        return arrow.get(value).to(timezone).format("DD/MM/YYYY HH:mm:ss")
+from transform import settings
+from transform.dates import format_date
 
 
 def statistical_unit_id_filter(value):
@@ -50,8 +42,15 @@ def trim_final_newline(value):
     return value.rstrip('\r\n')
 
 
-def get_env():
-    env = Environment(loader=PackageLoader('transform', 'templates'))
+def create_env(auto_reload=False, bytecode_cache_dir=None):
+    """Creates an environment for the package's templates with every filter registered.
+    Compiled templates are cached in bytecode_cache_dir, or a directory in the
+    system's temporary directory, so they outlive the worker which compiled them."""
+    env = Environment(
+        loader=PackageLoader('transform', 'templates'),
+        auto_reload=auto_reload,
+        bytecode_cache=FileSystemBytecodeCache(bytecode_cache_dir),
+    )
 
     env.filters['format_date'] = format_date
     env.filters['statistical_unit_id'] = statistical_unit_id_filter
@@ -61,3 +60,17 @@ def get_env():
     env.filters['trim_final_newline'] = trim_final_newline
 
     return env
+
+
+# Shared by everything which renders a template
+env = create_env(settings.TEMPLATE_AUTO_RELOAD, settings.TEMPLATE_CACHE_DIR)
+
+
+def get_env():
+    return env
+
+
+def precompile_templates():
+    """Compiles every template into the environment's cache, so no request has to"""
+    for name in env.list_templates():
+        env.get_template(name)
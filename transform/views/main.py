@@ -1,18 +1,24 @@
 from transform import app
+from transform import metrics
 from transform import settings
+from transform import warmup
+from transform.result_cache import get_result_cache, result_key
+from transform.survey_registry import surveys
 import logging
 from structlog import wrap_logger
-from flask import request, make_response, send_file, jsonify
+from flask import request, make_response, send_file, jsonify, Response
 from transform.transformers.image_transformer import PDFTransformer
-from transform.transformers.cora_transformer import CORATransformer
+from transform.transformers.cora_transformer import CORATransformer, CORAValidationError
+from transform.transformers.cora_batch_transformer import CORABatchTransformer
+from transform.transformers.formatters import format_idbr
+from transform.transformers.image_profile import get_image_profile
 from transform.transformers.image_transformer import ImageTransformer
-from transform.transformers.pdf_transformer_style_cora import CoraPdfTransformerStyle
-from jinja2 import Environment, PackageLoader
+from transform.transformers.rasteriser import RasterisationError
+from transform.transformers.pdf_transformer_style_cora import cora_pdf_style
+from transform.views.image_filters import env, precompile_templates
 
+import io
 import json
-import pkg_resources
-
-env = Environment(loader=PackageLoader('transform', 'templates'))
 
 logging.basicConfig(level=settings.LOGGING_LEVEL, format=settings.LOGGING_FORMAT)
 logger = wrap_logger(logging.getLogger(__name__))
@@ -49,26 +55,35 @@ def server_error(error=None):
     return resp
 
 
-def get_survey(survey_response):
-    try:
-        form_id = survey_response['collection']['instrument_id']
-        filename = ("../surveys/%s.%s.json" % (survey_response['survey_id'], form_id))
-        content = pkg_resources.resource_string(__name__, filename)
+def rasterisation_error(error, timer):
+    """A 500 for pages which couldn't be rasterised, saying how, in which stage
+    and how long each stage took"""
+    diagnostics = error.diagnostics()
+    diagnostics["stage"] = timer.failed
+    diagnostics["timings"] = timer.log_fields()
+    logger.error("Rasterisation error", error=str(error), **diagnostics)
+    message = {
+        'status': 500,
+        'message': "Could not rasterise pages: {0}".format(error),
+        'diagnostics': diagnostics,
+    }
+    resp = jsonify(message)
+    resp.status_code = 500
 
-    except FileNotFoundError:
-        return None
-    else:
-        return json.loads(content.decode("utf-8"))
+    return resp
+
+
+def get_survey(survey_response):
+    return surveys.get(survey_response['survey_id'], survey_response['collection']['instrument_id'])
 
 
 @app.route('/idbr', methods=['POST'])
 def render_idbr():
     response = request.get_json(force=True)
-    template = env.get_template('idbr.tmpl')
 
     logger.info("IDBR:SUCCESS")
 
-    return template.render(response=response)
+    return format_idbr(response)
 
 
 @app.route('/html', methods=['POST'])
@@ -96,7 +111,7 @@ def render_pdf():
         return client_error("PDF:Unsupported survey/instrument id")
 
     try:
-        pdf = PDFTransformer(survey, survey_response, CoraPdfTransformerStyle())
+        pdf = PDFTransformer(survey, survey_response, cora_pdf_style)
         rendered_pdf = pdf.render()
 
     except IOError as e:
@@ -120,10 +135,12 @@ def render_images():
     if not survey:
         return client_error("IMAGES:Unsupported survey/instrument id")
 
-    transformer = ImageTransformer(logger, survey, survey_response, CoraPdfTransformerStyle())
+    transformer = ImageTransformer(logger, survey, survey_response, cora_pdf_style)
 
     try:
         zipfile = transformer.get_zipped_images()
+    except RasterisationError as e:
+        return rasterisation_error(e, transformer.timer)
     except IOError as e:
         return client_error("IMAGES:Could not create zip buffer: {0}".format(repr(e)))
     except Exception as e:
@@ -147,20 +164,151 @@ def cora_view(sequence_no=1000):
     if not survey:
         return client_error("CORA:Unsupported survey/instrument id")
 
+    cache = get_result_cache()
+    if cache is not None:
+        key = result_key(survey_response, sequence_no, surveys.version(
+            survey_response['survey_id'], survey_response['collection']['instrument_id']), get_image_profile(survey))
+        result = cache.get(key)
+        if result is not None:
+            logger.info("CORA:returning cached result", tx_id=survey_response.get("tx_id"))
+            return send_file(io.BytesIO(result), mimetype='application/zip', add_etags=False)
+
     transformer = CORATransformer(logger, survey, survey_response, sequence_no)
 
     try:
-        transformer.create_zip()
+        if settings.CORA_STREAM_RESPONSE:
+            chunks = transformer.stream_zip()
+            if cache is not None:
+                chunks = cache.caching(key, chunks)
+            return Response(chunks, mimetype='application/zip')
+        else:
+            transformer.create_zip()
+    except CORAValidationError as e:
+        return client_error("CORA:{0}".format(e))
+    except RasterisationError as e:
+        return rasterisation_error(e, transformer.timer)
     except Exception as e:
         survey_id = survey_response.get("survey_id", -1)
         tx_id = survey_response.get("tx_id", -1)
         logger.exception("CORA:could not create files for survey", survey_id=survey_id, tx_id=tx_id)
         return server_error(e)
 
+    zip_file = transformer.get_zip()
+    if cache is not None:
+        cache.put(key, zip_file.getvalue())
+
+    return send_file(zip_file, mimetype='application/zip', add_etags=False)
+
+
+def get_batch_responses(body):
+    """Parses a batch body, either a JSON array or newline delimited JSON.
+    Returns a list of (survey_response, error) pairs, one per response.
+    """
+    try:
+        parsed = json.loads(body)
+    except ValueError:
+        parsed = None
+    else:
+        if isinstance(parsed, dict):
+            parsed = [parsed]
+
+    if isinstance(parsed, list):
+        return [(item, None) if isinstance(item, dict) else (None, "Response is not a JSON object")
+                for item in parsed]
+
+    responses = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            responses.append((None, "Could not parse response: {0}".format(repr(e))))
+        else:
+            if isinstance(item, dict):
+                responses.append((item, None))
+            else:
+                responses.append((None, "Response is not a JSON object"))
+
+    return responses
+
+
+@app.route('/cora/batch', methods=['POST'])
+@app.route('/cora/batch/<sequence_no>', methods=['POST'])
+def cora_batch_view(sequence_no=1000):
+    try:
+        responses = get_batch_responses(request.get_data().decode("utf-8"))
+    except UnicodeDecodeError as e:
+        return client_error("CORA:Could not decode batch: {0}".format(repr(e)))
+
+    if not any(survey_response for survey_response, _ in responses):
+        return client_error("CORA:No survey responses in batch")
+
+    transformer = CORABatchTransformer(logger, int(sequence_no))
+
+    for survey_response, error in responses:
+        if error:
+            transformer.add_error(error)
+            continue
+
+        try:
+            survey = get_survey(survey_response)
+        except (KeyError, TypeError):
+            survey = None
+
+        if survey:
+            transformer.add(survey, survey_response)
+        else:
+            transformer.add_error("Unsupported survey/instrument id", tx_id=survey_response.get("tx_id"))
+
+    try:
+        transformer.create_zip()
+    except Exception as e:
+        logger.exception("CORA:could not create batch")
+        return server_error(e)
+
     return send_file(transformer.get_zip(), mimetype='application/zip', add_etags=False)
 
 
+precompile_templates()
+
+
+metrics.registry.register(metrics.Callback(
+    "cora_survey_definitions", "Survey definitions loaded.", "gauge", lambda: surveys.stats()["surveys"]))
+metrics.registry.register(metrics.Callback(
+    "cora_survey_lookups_total", "Survey definitions found.", "counter", lambda: surveys.stats()["hits"]))
+metrics.registry.register(metrics.Callback(
+    "cora_survey_misses_total", "Survey definitions asked for but not found.", "counter", lambda: surveys.stats()["misses"]))
+
+
+if get_result_cache() is not None:
+    metrics.registry.register(metrics.Callback(
+        "cora_cache_hits_total", "Transforms answered from the result cache.", "counter",
+        lambda: get_result_cache().hits))
+    metrics.registry.register(metrics.Callback(
+        "cora_cache_misses_total", "Transforms not found in the result cache.", "counter",
+        lambda: get_result_cache().misses))
+    metrics.registry.register(metrics.Callback(
+        "cora_cache_evictions_total", "Results dropped from the result cache to keep within its budgets.", "counter",
+        lambda: get_result_cache().evictions))
+    metrics.registry.register(metrics.Callback(
+        "cora_cache_bytes", "Bytes of results held in memory.", "gauge",
+        lambda: get_result_cache().bytes))
+    metrics.registry.register(metrics.Callback(
+        "cora_cache_disk_bytes", "Bytes of results held on disk.", "gauge",
+        lambda: get_result_cache().disk_bytes()))
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_view():
+    return Response(metrics.registry.expose(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route('/info', methods=['GET'])
 @app.route('/healthcheck', methods=['GET'])
 def healthcheck():
+    if warmup.state in ("warming", "failed"):
+        resp = jsonify({'status': warmup.state.upper()})
+        resp.status_code = 503
+        return resp
     return jsonify({'status': 'OK'})
@@ -1,8 +1,9 @@
 from transform.transformers.pdf_transformer import PDFTransformer
-from transform.transformers.pdf_transformer_style_cora import CoraPdfTransformerStyle
+from transform.transformers.pdf_transformer_style_cora import cora_pdf_style
 from transform.transformers.image_transformer import ImageTransformer
 from transform import app
-from jinja2 import Environment, PackageLoader
+from transform.survey_registry import surveys
+from transform.views.image_filters import env
 
 from flask import make_response, send_file
 import logging
@@ -11,8 +12,6 @@ import json
 
 logger = wrap_logger(logging.getLogger(__name__))
 
-env = Environment(loader=PackageLoader('transform', 'templates'))
-
 test_message = """{
    "type": "uk.gov.ons.edc.eq:surveyresponse",
    "origin": "uk.gov.ons.edc.eq",
@@ -195,33 +194,27 @@ test_message = """{
 @app.route('/images-test', methods=['GET'])
 def images_test():
     survey_response = json.loads(test_message)
-    form_id = survey_response['collection']['instrument_id']
-
-    with open("./transform/surveys/%s.%s.json" % (survey_response['survey_id'], form_id)) as json_file:
-        survey = json.load(json_file)
+    survey = surveys.get(survey_response['survey_id'], survey_response['collection']['instrument_id'])
 
-        itransformer = ImageTransformer(logger, survey, survey_response, CoraPdfTransformerStyle())
+    itransformer = ImageTransformer(logger, survey, survey_response, cora_pdf_style)
 
-        itransformer.get_zipped_images()
+    itransformer.get_zipped_images()
 
-        return send_file(itransformer.zip, mimetype='application/zip')
+    return send_file(itransformer.zip.in_memory_zip, mimetype='application/zip')
 
 
 @app.route('/pdf-test', methods=['GET'])
 def pdf_test():
     survey_response = json.loads(test_message)
-    form_id = survey_response['collection']['instrument_id']
-
-    with open("./transform/surveys/%s.%s.json" % (survey_response['survey_id'], form_id)) as json_file:
-        survey = json.load(json_file)
+    survey = surveys.get(survey_response['survey_id'], survey_response['collection']['instrument_id'])
 
-        pdf = PDFTransformer(survey, survey_response, CoraPdfTransformerStyle())
-        rendered_pdf = pdf.render()
+    pdf = PDFTransformer(survey, survey_response, cora_pdf_style)
+    rendered_pdf = pdf.render()
 
-        response = make_response(rendered_pdf)
-        response.mimetype = 'application/pdf'
+    response = make_response(rendered_pdf)
+    response.mimetype = 'application/pdf'
 
-        return response
+    return response
 
 
 @app.route('/html-test', methods=['GET'])
@@ -229,8 +222,6 @@ def html_test():
 
     response = json.loads(test_message)
     template = env.get_template('html.tmpl')
-    form_id = response['collection']['instrument_id']
+    survey = surveys.get(response['survey_id'], response['collection']['instrument_id'])
 
-    with open("./transform/surveys/%s.%s.json" % (response['survey_id'], form_id)) as json_file:
-        survey = json.load(json_file)
-        return template.render(response=response, survey=survey)
+    return template.render(response=response, survey=survey)
@@ -0,0 +1,72 @@
+import itertools
+import json
+import logging
+import threading
+import time
+
+from structlog import wrap_logger
+
+from transform.metrics import StageTimer
+from transform.survey_registry import surveys
+from transform.transformers.cora_transformer import CORATransformer
+from transform.transformers.in_memory_zip import stream_zip
+from transform.views.test_views import test_message
+
+logger = wrap_logger(logging.getLogger(__name__))
+
+# None until a warm-up starts, then warming, and warm or failed once it's done
+state = None
+
+
+def warm_up():
+    """Transforms a synthetic submission through the whole /cora pipeline and
+    throws the result away, so templates, fonts, the pdf skeleton, timezone
+    data and the rasteriser are loaded before the first real request.
+    Image numbers are made up rather than taken from sdx-sequence, and the
+    stage timings are left out of the metrics. Failures are raised."""
+    global state
+    state = "warming"
+    start = time.perf_counter()
+
+    try:
+        response = json.loads(test_message)
+        survey = surveys.get(response["survey_id"], response["collection"]["instrument_id"])
+
+        transformer = CORATransformer(logger, survey, response)
+        transformer.timer = transformer.image_transformer.timer = StageTimer(record=False)
+
+        for _ in stream_zip(transformer.get_entries(itertools.count(1))):
+            pass
+    except Exception:
+        state = "failed"
+        logger.exception("Warm-up failed", seconds=round(time.perf_counter() - start, 3))
+        raise
+
+    state = "warm"
+    logger.info("Warmed up", seconds=round(time.perf_counter() - start, 3), **transformer.timer.log_fields())
+
+
+def start_warm_up(retry_seconds=5, attempts=5):
+    """Warms up on a background thread, trying up to attempts times, twice as
+    long apart each time; the healthcheck fails until it's warm"""
+    global state
+    state = "warming"
+    threading.Thread(target=_warm_up_until_warm, args=(retry_seconds, attempts),
+                     name="warm-up", daemon=True).start()
+
+
+def _warm_up_until_warm(retry_seconds, attempts):
+    global state
+    for attempt in range(1, attempts + 1):
+        try:
+            warm_up()
+            return
+        except Exception:
+            if attempt < attempts:
+                delay = retry_seconds * 2 ** (attempt - 1)
+                logger.warning("Retrying warm-up", attempt=attempt, attempts=attempts, retry_seconds=delay)
+                state = "warming"
+                time.sleep(delay)
+
+    state = "failed"
+    logger.error("Giving up warm-up", attempts=attempts)